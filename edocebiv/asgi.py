@@ -18,16 +18,25 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'edocebiv.settings')
 # Call setup first
 django_asgi_app = get_asgi_application()
 
-# Now it's safe to import your routing (models will load fine)
-import users.routing
+_websocket_app = None
+
+
+def _build_websocket_app():
+    # Imported here so consumers (and the AI code they pull in) load on the
+    # first WebSocket connection rather than at worker startup
+    from users.routing import websocket_urlpatterns
+
+    return AuthMiddlewareStack(URLRouter(websocket_urlpatterns))
+
+
+async def websocket_app(scope, receive, send):
+    global _websocket_app
+    if _websocket_app is None:
+        _websocket_app = _build_websocket_app()
+    return await _websocket_app(scope, receive, send)
+
 
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
-    "websocket": AllowedHostsOriginValidator(
-        AuthMiddlewareStack(
-            URLRouter(
-                users.routing.websocket_urlpatterns
-            )
-        )
-    ),
+    "websocket": AllowedHostsOriginValidator(websocket_app),
 })
@@ -1,3 +1,15 @@
+import re
+
+# Authentication-related paths: /accounts/..., the home page, and anything mentioning signup or login
+_NOCACHE_RE = re.compile(r'\A/(?:accounts/|\Z)|signup|login', re.IGNORECASE)
+
+_NOCACHE_HEADERS = (
+    ('Cache-Control', 'no-store, no-cache, must-revalidate, max-age=0'),
+    ('Pragma', 'no-cache'),
+    ('Expires', '0'),
+)
+
+
 class NoCacheMiddleware:
     """
     Middleware to add no-cache headers to specific responses.
@@ -11,11 +23,9 @@ class NoCacheMiddleware:
         response = self.get_response(request)
 
         # Only add no-cache headers to authentication-related pages
-        path = request.path.lower()
-        if path.startswith('/accounts/') or path == '/' or 'signup' in path or 'login' in path:
+        if _NOCACHE_RE.search(request.path):
             # Add no-cache headers
-            response['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
-            response['Pragma'] = 'no-cache'
-            response['Expires'] = '0'
+            for header, value in _NOCACHE_HEADERS:
+                response[header] = value
 
         return response
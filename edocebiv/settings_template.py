@@ -90,15 +90,53 @@ WSGI_APPLICATION = 'edocebiv.wsgi.application'
 ASGI_APPLICATION = 'edocebiv.asgi.application'
 
 # Channels settings
+# The pub/sub layer sends a group message with a single Redis PUBLISH instead of
+# a Lua script over the group's members; the events sent here are fire-and-forget
+# notifications to connected editors, so they don't need the queued delivery of
+# channels_redis.core.RedisChannelLayer
 CHANNEL_LAYERS = {
     "default": {
-        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        "BACKEND": "channels_redis.pubsub.RedisPubSubChannelLayer",
         "CONFIG": {
             "hosts": [("127.0.0.1", 6379)],
         },
     },
 }
 
+# Set to True when one process serves every WebSocket (e.g. a single Daphne
+# worker), so tool events skip the channel-layer group fan-out
+TOOL_EVENTS_SINGLE_PROCESS = False
+
+# Cache
+# Reasoning step responses are cached here; use a shared backend (e.g. Redis) in production
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Seconds to keep cached reasoning step responses
+REASONING_STEP_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Minimum cosine similarity between prompt embeddings for a cached conclusion
+# response to be reused for a differently worded prompt (None disables). Every
+# cache miss costs an extra embeddings request.
+REASONING_SEMANTIC_CACHE_THRESHOLD = None
+
+# Optional local classifier deciding which chat messages use the reasoning chain
+# (needs onnxruntime and tokenizers); None uses keyword heuristics. Example:
+# {'model': BASE_DIR / 'models' / 'complex_task.onnx', 'tokenizer': BASE_DIR / 'models' / 'tokenizer.json', 'threshold': 0.5}
+COMPLEX_TASK_CLASSIFIER = None
+
+# Whether the AI file tools resolve symlinks when checking that a path is inside
+# the project; turning it off saves system calls but lets symlinks created in a
+# project (e.g. by code run in its container) point outside of it
+FILE_TOOLS_RESOLVE_SYMLINKS = True
+
+# Set to True to delete directories for the AI file tools with coreutils rm,
+# which is faster than shutil.rmtree on large trees (POSIX only)
+USE_FAST_RMTREE = False
+
 # Database
 DATABASES = {
     'default': {
@@ -32,5 +32,7 @@ urlpatterns = [
 ]
 
 # Serve static files from Django
-# This is not recommended for production, but we're doing it to fix MIME type issues
-urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
+# This is not recommended for production, but we're doing it to fix MIME type issues.
+# static() returns no patterns unless DEBUG is on, so skip it entirely otherwise.
+if settings.DEBUG:
+    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
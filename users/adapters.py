@@ -23,7 +23,7 @@ class StandardAccountAdapter(DefaultAccountAdapter):
         """
         Allow both direct and social login
         """
-        logger.info(f"Login successful for user: {user.email}")
+        logger.info("Login successful for user: %s", user.email)
         return super().login(request, user)
 
     def save_user(self, request, user, form, commit=True):
@@ -39,7 +39,7 @@ class StandardAccountAdapter(DefaultAccountAdapter):
         if commit:
             user.save()
 
-        logger.info(f"User saved: {user.email}")
+        logger.info("User saved: %s", user.email)
         return user
 
 # Keep the old adapter for reference or if we need to switch back
@@ -60,17 +60,32 @@ class NoNewUsersAccountAdapter(DefaultAccountAdapter):
         Only allow social login
         """
         # Check if this is a social login
-        sociallogin = getattr(user, 'socialaccount_set', None)
-        if sociallogin and sociallogin.exists():
+        if self._is_social_login(request, user):
             # This is a social login, proceed normally
-            logger.info(f"Social login successful for user: {user.email}")
+            logger.info("Social login successful for user: %s", user.email)
             return super().login(request, user)
         else:
             # This is a direct login attempt, redirect to social login
-            logger.warning(f"Direct login attempt blocked for user: {user.email}")
+            logger.warning("Direct login attempt blocked for user: %s", user.email)
             messages.error(request, "Direct login is disabled. Please use Google to sign in.")
             return HttpResponseRedirect(reverse('account_login'))
 
+    def _is_social_login(self, request, user):
+        """
+        Determine whether the login comes from a social account, preferring
+        the marker left on this request by the social flow over a database query
+        """
+        if getattr(request, '_is_social_login', False):
+            return True
+
+        # Fall back to the database, remembering the answer on the user
+        has_social = getattr(user, '_has_social', None)
+        if has_social is None:
+            socialaccounts = getattr(user, 'socialaccount_set', None)
+            has_social = socialaccounts is not None and socialaccounts.exists()
+            user._has_social = has_social
+        return has_social
+
     def authenticate(self, request, **credentials):
         """
         Prevent direct authentication
@@ -87,7 +102,7 @@ class CustomSocialAccountAdapter(DefaultSocialAccountAdapter):
         """
         Always allow social signup
         """
-        logger.info(f"Social signup attempt from provider: {sociallogin.account.provider}")
+        logger.info("Social signup attempt from provider: %s", sociallogin.account.provider)
         return True
 
     def pre_social_login(self, request, sociallogin):
@@ -96,7 +111,10 @@ class CustomSocialAccountAdapter(DefaultSocialAccountAdapter):
         """
         provider = sociallogin.account.provider
         uid = sociallogin.account.uid
-        logger.info(f"Pre-social login: Provider={provider}, UID={uid}")
+        logger.info("Pre-social login: Provider=%s, UID=%s", provider, uid)
+
+        # Mark the request so the account adapter can skip its social-account lookup
+        request._is_social_login = True
         return super().pre_social_login(request, sociallogin)
 
     def save_user(self, request, sociallogin, form=None):
@@ -104,5 +122,5 @@ class CustomSocialAccountAdapter(DefaultSocialAccountAdapter):
         Save the user and log the action
         """
         user = super().save_user(request, sociallogin, form)
-        logger.info(f"Social user saved: {user.email} from provider {sociallogin.account.provider}")
+        logger.info("Social user saved: %s from provider %s", user.email, sociallogin.account.provider)
         return user
@@ -1,20 +1,37 @@
 from django.contrib import admin
+from django.db.models import BooleanField, ExpressionWrapper, Q
 from .models import Project, UserProfile
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'has_api_key', 'created_at', 'updated_at')
-    search_fields = ('user__email', 'user__username')
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
+    # Prefix searches (LIKE 'q%') can use an index, unlike substring searches
+    search_fields = ('^user__email', '^user__username')
     date_hierarchy = 'created_at'
 
+    def get_queryset(self, request):
+        # Compute the API key flag in SQL instead of loading every key
+        return super().get_queryset(request).annotate(
+            _has_api_key=ExpressionWrapper(
+                Q(openai_api_key__gt=''),
+                output_field=BooleanField()
+            )
+        )
+
     def has_api_key(self, obj):
-        return bool(obj.openai_api_key)
+        return bool(obj._has_api_key)
     has_api_key.boolean = True
     has_api_key.short_description = 'Has API Key'
+    has_api_key.admin_order_field = '_has_api_key'
 
 @admin.register(Project)
 class ProjectAdmin(admin.ModelAdmin):
     list_display = ('title', 'user', 'created_at', 'updated_at')
     list_filter = ('created_at', 'updated_at')
-    search_fields = ('title', 'description', 'user__email', 'user__username')
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
+    # Prefix searches (LIKE 'q%') can use an index, unlike substring searches
+    search_fields = ('^title', '^user__email', '^user__username')
     date_hierarchy = 'created_at'
@@ -5,21 +5,156 @@ This module provides tools for the AI assistant to interact with the codebase.
 
 import os
 import re
+import stat
 import json
 import logging
+import functools
+from collections import OrderedDict
 from django.shortcuts import get_object_or_404
 from .models import Project
 
+try:
+    # orjson is an optional, faster drop-in for parsing tool-call payloads
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
 logger = logging.getLogger(__name__)
 
+# Largest file read_file will load into a tool result
+MAX_READ_BYTES = 8 * 1024 * 1024
+
+# Number of file contents each AIProtocol keeps cached for read_file
+READ_CACHE_SIZE = 128
+
+# Path segments rejected before any filesystem access
+_BAD_SEGMENTS = frozenset(('..',))
+
+# Matches a fenced ```tool block and captures its JSON payload
+_TOOL_RE = re.compile(r'```tool\s+([\s\S]*?)```')
+
+
+def _iter_tool_calls(message):
+    """Yield tool calls from an AI message in a single regex pass.
+
+    Args:
+        message (str): The AI message to parse.
+
+    Yields:
+        tuple: (match, tool_call) for every tool block with a valid JSON payload.
+    """
+    # A plain substring search is much cheaper than the regex for messages without tools
+    if '```tool' not in message:
+        return
+
+    for match in _TOOL_RE.finditer(message):
+        try:
+            # Parse the tool call as JSON
+            tool_call = _loads(match.group(1))
+        except ValueError:
+            # If the tool call is not valid JSON, skip it
+            continue
+        yield match, tool_call
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_tool_matches(message):
+    """Parse and cache the tool calls of an AI message.
+
+    Results are cached per message, so repeated processing of the same
+    message skips the regex scan and JSON parsing. The returned tool call
+    dicts are shared between callers and must not be mutated.
+
+    Args:
+        message (str): The AI message to parse.
+
+    Returns:
+        tuple: (match, tool_call) tuples for every valid tool block.
+    """
+    return tuple(_iter_tool_calls(message))
+
+
+def _write_file(full_path, content, flags=os.O_WRONLY | os.O_CREAT | os.O_TRUNC):
+    """Write text content to a file through a raw file descriptor.
+
+    The content is encoded once and handed to os.write, skipping the
+    TextIOWrapper/BufferedWriter layers of a text-mode open().
+
+    Args:
+        full_path (str): Absolute path of the file to write.
+        content (str): Text content to write.
+        flags (int, optional): Flags for os.open. Defaults to truncating writes.
+    """
+    data = memoryview(content.encode('utf-8'))
+    fd = os.open(full_path, flags, 0o644)
+    try:
+        while data:
+            data = data[os.write(fd, data):]
+    finally:
+        os.close(fd)
+
+
 class AIProtocol:
     """Protocol for AI to interact with the codebase."""
 
+    # Names of the methods the AI is allowed to call as tools
+    _ALLOWED_TOOLS = frozenset({
+        'update_file',
+        'batch_update',
+        'create_file',
+        'delete_file',
+        'read_file',
+        'list_files'
+    })
+
     def __init__(self, project, user):
         """Initialize the protocol with a project and user."""
         self.project = project
         self.user = user
         self.data_dir = project.get_data_directory()
+        self._data_dir = os.path.realpath(self.data_dir)
+        self._data_dir_prefix = self._data_dir + os.sep
+        # File contents keyed by (full_path, mtime_ns, size), least recently used first
+        self._read_cache = OrderedDict()
+
+    def _safe_join(self, file_path):
+        """Resolve a path relative to the project directory.
+
+        Symlinks are resolved for the check only; the path returned is not
+        resolved, so a symlink in the project is acted on as the link itself.
+
+        Args:
+            file_path (str): Path relative to the project root.
+
+        Returns:
+            str: The normalized absolute path, or None if it escapes the project directory.
+        """
+        # Reject absolute paths and traversal lexically, without touching the filesystem
+        if file_path.startswith(('/', '\\')):
+            return None
+        if any(part in _BAD_SEGMENTS for part in file_path.replace('\\', '/').split('/')):
+            return None
+
+        full_path = os.path.normpath(os.path.join(self._data_dir, file_path))
+        real_path = os.path.realpath(full_path)
+        if real_path == self._data_dir or real_path.startswith(self._data_dir_prefix):
+            return full_path
+        return None
+
+    def _invalidate_read_cache(self, full_path):
+        """Drop cached contents for a path and anything below it.
+
+        Args:
+            full_path (str): Absolute path that was written or deleted.
+        """
+        dir_prefix = full_path + os.sep
+        stale = [
+            key for key in self._read_cache
+            if key[0] == full_path or key[0].startswith(dir_prefix)
+        ]
+        for key in stale:
+            del self._read_cache[key]
 
     def update_file(self, file_path, content):
         """Update the content of a file.
@@ -33,8 +168,8 @@ class AIProtocol:
         """
         try:
             # Security check: make sure the file is within the project directory
-            full_path = os.path.join(self.data_dir, file_path)
-            if os.path.commonpath([full_path, self.data_dir]) != self.data_dir:
+            full_path = self._safe_join(file_path)
+            if full_path is None:
                 return {
                     'status': 'error',
                     'message': 'Invalid file path. The file must be within the project directory.'
@@ -44,8 +179,8 @@ class AIProtocol:
             os.makedirs(os.path.dirname(full_path), exist_ok=True)
 
             # Write the file
-            with open(full_path, 'w') as f:
-                f.write(content)
+            _write_file(full_path, content)
+            self._invalidate_read_cache(full_path)
 
             return {
                 'status': 'success',
@@ -59,6 +194,61 @@ class AIProtocol:
                 'message': f'Error updating file: {str(e)}'
             }
 
+    def batch_update(self, files):
+        """Update the content of several files in one tool call.
+
+        Prefer this over multiple update_file calls when rewriting several
+        files in one message: paths are validated up front and the writes
+        happen in a single loop.
+
+        Args:
+            files (dict): Mapping of file paths relative to the project root to their new content.
+
+        Returns:
+            dict: Result of the operation with a result per file.
+        """
+        # Validate every path before writing anything
+        full_paths = {}
+        for file_path in files:
+            full_path = self._safe_join(file_path)
+            if full_path is None:
+                return {
+                    'status': 'error',
+                    'message': f'Invalid file path {file_path}. All files must be within the project directory.'
+                }
+            full_paths[file_path] = full_path
+
+        results = {}
+        for file_path, content in files.items():
+            full_path = full_paths[file_path]
+            try:
+                # Create directory if it doesn't exist
+                os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+                # Write the file
+                _write_file(full_path, content)
+                self._invalidate_read_cache(full_path)
+                results[file_path] = {'status': 'success'}
+            except Exception as e:
+                results[file_path] = {
+                    'status': 'error',
+                    'message': f'Error updating file: {str(e)}'
+                }
+
+        failed = [file_path for file_path, result in results.items() if result['status'] == 'error']
+        if failed:
+            return {
+                'status': 'error',
+                'message': f'Failed to update {len(failed)} of {len(files)} files: {", ".join(failed)}',
+                'results': results
+            }
+
+        return {
+            'status': 'success',
+            'message': f'{len(files)} files updated successfully.',
+            'results': results
+        }
+
     def create_file(self, file_path, content=""):
         """Create a new file.
 
@@ -69,55 +259,46 @@ class AIProtocol:
         Returns:
             dict: Result of the operation.
         """
-        logger.info(f"Creating file: {file_path} in project directory: {self.data_dir}")
+        logger.info("Creating file: %s in project directory: %s", file_path, self.data_dir)
 
         try:
             # Security check: make sure the file is within the project directory
-            full_path = os.path.join(self.data_dir, file_path)
-            logger.info(f"Full path for new file: {full_path}")
+            full_path = self._safe_join(file_path)
+            logger.info("Full path for new file: %s", full_path)
 
-            if os.path.commonpath([full_path, self.data_dir]) != self.data_dir:
-                logger.error(f"Security check failed: {full_path} is outside project directory {self.data_dir}")
+            if full_path is None:
+                logger.error("Security check failed: %s is outside project directory %s", file_path, self.data_dir)
                 return {
                     'status': 'error',
                     'message': 'Invalid file path. The file must be within the project directory.'
                 }
 
-            # Check if the file already exists
-            if os.path.exists(full_path):
-                logger.warning(f"File already exists: {full_path}")
-                return {
-                    'status': 'error',
-                    'message': f'File {file_path} already exists.'
-                }
-
             # Create directory if it doesn't exist
             dir_path = os.path.dirname(full_path)
-            logger.info(f"Creating directory if needed: {dir_path}")
+            logger.info("Creating directory if needed: %s", dir_path)
             os.makedirs(dir_path, exist_ok=True)
 
-            # Write the file
-            logger.info(f"Writing content to file: {full_path}")
-            with open(full_path, 'w') as f:
-                f.write(content)
-
-            # Verify the file was created
-            if os.path.exists(full_path):
-                logger.info(f"File created successfully: {full_path}")
-                return {
-                    'status': 'success',
-                    'message': f'File {file_path} created successfully.',
-                    'file_path': file_path
-                }
-            else:
-                logger.error(f"File creation verification failed: {full_path} does not exist after write operation")
+            # Write the file, failing atomically if it already exists
+            logger.info("Writing content to file: %s", full_path)
+            try:
+                _write_file(full_path, content, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+                self._invalidate_read_cache(full_path)
+            except FileExistsError:
+                logger.warning("File already exists: %s", full_path)
                 return {
                     'status': 'error',
-                    'message': f'File {file_path} could not be verified after creation.'
+                    'message': f'File {file_path} already exists.'
                 }
 
+            logger.info("File created successfully: %s", full_path)
+            return {
+                'status': 'success',
+                'message': f'File {file_path} created successfully.',
+                'file_path': file_path
+            }
+
         except Exception as e:
-            logger.exception(f"Error creating file {file_path}: {str(e)}")
+            logger.exception("Error creating file %s: %s", file_path, e)
             return {
                 'status': 'error',
                 'message': f'Error creating file: {str(e)}'
@@ -134,28 +315,34 @@ class AIProtocol:
         """
         try:
             # Security check: make sure the file is within the project directory
-            full_path = os.path.join(self.data_dir, file_path)
-            if os.path.commonpath([full_path, self.data_dir]) != self.data_dir:
+            full_path = self._safe_join(file_path)
+            if full_path is None:
                 return {
                     'status': 'error',
                     'message': 'Invalid file path. The file must be within the project directory.'
                 }
 
-            # Check if the file exists
-            if not os.path.exists(full_path):
+            # Check if the file exists; lstat so that a symlink is seen as the link itself
+            try:
+                st = os.lstat(full_path)
+            except FileNotFoundError:
                 return {
                     'status': 'error',
                     'message': f'File {file_path} does not exist.'
                 }
 
-            # Delete the file
-            if os.path.isdir(full_path):
+            # Delete the file; a symlink is unlinked, never its target
+            if stat.S_ISLNK(st.st_mode):
+                os.unlink(full_path)
+                message = f'Link {file_path} deleted successfully.'
+            elif stat.S_ISDIR(st.st_mode):
                 import shutil
                 shutil.rmtree(full_path)
                 message = f'Directory {file_path} deleted successfully.'
             else:
                 os.remove(full_path)
                 message = f'File {file_path} deleted successfully.'
+            self._invalidate_read_cache(full_path)
 
             return {
                 'status': 'success',
@@ -180,30 +367,57 @@ class AIProtocol:
         """
         try:
             # Security check: make sure the file is within the project directory
-            full_path = os.path.join(self.data_dir, file_path)
-            if os.path.commonpath([full_path, self.data_dir]) != self.data_dir:
+            full_path = self._safe_join(file_path)
+            if full_path is None:
                 return {
                     'status': 'error',
                     'message': 'Invalid file path. The file must be within the project directory.'
                 }
 
             # Check if the file exists
-            if not os.path.exists(full_path):
+            try:
+                st = os.stat(full_path)
+            except FileNotFoundError:
                 return {
                     'status': 'error',
                     'message': f'File {file_path} does not exist.'
                 }
 
             # Check if it's a directory
-            if os.path.isdir(full_path):
+            if stat.S_ISDIR(st.st_mode):
                 return {
                     'status': 'error',
                     'message': f'{file_path} is a directory, not a file.'
                 }
 
-            # Read the file
-            with open(full_path, 'r') as f:
-                content = f.read()
+            # Refuse files too large to return in a tool result
+            if st.st_size > MAX_READ_BYTES:
+                return {
+                    'status': 'error',
+                    'message': f'File {file_path} is too large to read ({st.st_size} bytes).'
+                }
+
+            # Reuse the cached content while the file is unchanged
+            cache_key = (full_path, st.st_mtime_ns, st.st_size)
+            content = self._read_cache.get(cache_key)
+            if content is not None:
+                self._read_cache.move_to_end(cache_key)
+            else:
+                # Read the file in one raw read and decode it
+                with open(full_path, 'rb') as f:
+                    data = f.read(st.st_size)
+                try:
+                    content = data.decode('utf-8')
+                except UnicodeDecodeError:
+                    return {
+                        'status': 'error',
+                        'message': f'File {file_path} is not a UTF-8 text file.'
+                    }
+
+                self._invalidate_read_cache(full_path)
+                self._read_cache[cache_key] = content
+                if len(self._read_cache) > READ_CACHE_SIZE:
+                    self._read_cache.popitem(last=False)
 
             return {
                 'status': 'success',
@@ -229,44 +443,41 @@ class AIProtocol:
         """
         try:
             # Security check: make sure the directory is within the project directory
-            full_path = os.path.join(self.data_dir, directory_path)
-            if os.path.commonpath([full_path, self.data_dir]) != self.data_dir:
+            full_path = self._safe_join(directory_path)
+            if full_path is None:
                 return {
                     'status': 'error',
                     'message': 'Invalid directory path. The directory must be within the project directory.'
                 }
 
             # Check if the directory exists
-            if not os.path.exists(full_path):
+            try:
+                st = os.stat(full_path)
+            except FileNotFoundError:
                 return {
                     'status': 'error',
                     'message': f'Directory {directory_path} does not exist.'
                 }
 
             # Check if it's a directory
-            if not os.path.isdir(full_path):
+            if not stat.S_ISDIR(st.st_mode):
                 return {
                     'status': 'error',
                     'message': f'{directory_path} is a file, not a directory.'
                 }
 
-            # List files and directories
-            items = []
-            for item in os.listdir(full_path):
-                item_path = os.path.join(directory_path, item)
-                item_full_path = os.path.join(self.data_dir, item_path)
-
-                # Skip hidden files
-                if item.startswith('.'):
-                    continue
-
-                is_dir = os.path.isdir(item_full_path)
-
-                items.append({
-                    'name': item,
-                    'path': item_path,
-                    'is_dir': is_dir
-                })
+            # List files and directories, skipping hidden files
+            prefix = directory_path.rstrip('/') + '/' if directory_path else ''
+            with os.scandir(full_path) as it:
+                items = [
+                    {
+                        'name': entry.name,
+                        'path': prefix + entry.name,
+                        'is_dir': entry.is_dir(follow_symlinks=False)
+                    }
+                    for entry in it
+                    if not entry.name.startswith('.')
+                ]
 
             # Sort items: directories first, then files, both alphabetically
             items.sort(key=lambda x: (not x['is_dir'], x['name'].lower()))
@@ -294,23 +505,7 @@ class AIProtocol:
         Returns:
             list: List of tool calls.
         """
-        # Regular expression to match tool calls
-        tool_pattern = r'```tool\s+([\s\S]*?)```'
-
-        # Find all tool calls in the message
-        tool_matches = re.findall(tool_pattern, message)
-
-        tool_calls = []
-        for tool_match in tool_matches:
-            try:
-                # Parse the tool call as JSON
-                tool_call = json.loads(tool_match)
-                tool_calls.append(tool_call)
-            except json.JSONDecodeError:
-                # If the tool call is not valid JSON, skip it
-                continue
-
-        return tool_calls
+        return [tool_call for _, tool_call in _parse_tool_matches(message)]
 
     def execute_tool(self, tool_call):
         """Execute a tool call.
@@ -324,25 +519,41 @@ class AIProtocol:
         tool_name = tool_call.get('name')
         arguments = tool_call.get('arguments', {})
 
-        # Map tool names to methods
-        tools = {
-            'update_file': self.update_file,
-            'create_file': self.create_file,
-            'delete_file': self.delete_file,
-            'read_file': self.read_file,
-            'list_files': self.list_files
-        }
-
         # Check if the tool exists
-        if tool_name not in tools:
+        if tool_name not in self._ALLOWED_TOOLS:
             return {
                 'status': 'error',
                 'message': f'Unknown tool: {tool_name}'
             }
 
         # Execute the tool
-        tool_method = tools[tool_name]
-        return tool_method(**arguments)
+        return getattr(self, tool_name)(**arguments)
+
+    @staticmethod
+    def _render_tool_result(tool_name, result):
+        """Render a tool result as the HTML block shown in the chat.
+
+        Args:
+            tool_name (str): Name of the executed tool.
+            result (dict): Result returned by the tool.
+
+        Returns:
+            str: The rendered replacement for the tool block.
+        """
+        status = result['status']
+
+        # Create a more detailed replacement with tool name and status
+        replacement = f'<div class="chat-tool-result {status}" data-tool-type="{tool_name}">\n'
+        replacement += f"# Tool Result: {status.upper()}\n"
+        replacement += f"# Tool: {tool_name}\n\n"
+        replacement += f"{result['message']}\n"
+
+        # Add file path if available
+        if 'file_path' in result:
+            replacement += f"\nFile: {result['file_path']}"
+
+        replacement += "</div>"
+        return replacement
 
     def process_message(self, message):
         """Process an AI message and execute any tool calls.
@@ -353,16 +564,20 @@ class AIProtocol:
         Returns:
             tuple: (processed_message, tool_results)
         """
-        # Parse tool calls from the message
-        tool_calls = self.parse_tools_from_message(message)
+        # Most messages contain no tool calls at all
+        if '```tool' not in message:
+            return message, []
+
+        # Parse tool calls from the message, keeping their matches
+        parsed = _parse_tool_matches(message)
 
         # If there are no tool calls, return the original message
-        if not tool_calls:
+        if not parsed:
             return message, []
 
         # Execute each tool call
         tool_results = []
-        for tool_call in tool_calls:
+        for _, tool_call in parsed:
             result = self.execute_tool(tool_call)
             tool_results.append({
                 'tool': tool_call.get('name'),
@@ -370,33 +585,18 @@ class AIProtocol:
                 'result': result
             })
 
-        # Replace tool calls with their results in the message
-        processed_message = message
-        for i, tool_match in enumerate(re.finditer(r'```tool\s+([\s\S]*?)```', message)):
-            if i < len(tool_results):
-                result = tool_results[i]['result']
-                tool_name = tool_results[i]['tool']
-                status = result['status']
-                result_message = result['message']
-
-                # Create a more detailed replacement with tool name and status
-                replacement = f'<div class="chat-tool-result {status}" data-tool-type="{tool_name}">\n'
-                replacement += f"# Tool Result: {status.upper()}\n"
-                replacement += f"# Tool: {tool_name}\n\n"
-                replacement += f"{result_message}\n"
-
-                # Add file path if available
-                if 'file_path' in result:
-                    replacement += f"\nFile: {result['file_path']}"
-
-                replacement += "</div>"
-
-                processed_message = processed_message.replace(tool_match.group(0), replacement, 1)
+        # Replace tool calls with their results in a single pass over the message
+        replacements = {
+            tool_match.start(): self._render_tool_result(tool_result['tool'], tool_result['result'])
+            for (tool_match, _), tool_result in zip(parsed, tool_results)
+        }
+        processed_message = _TOOL_RE.sub(
+            lambda m: replacements.get(m.start(), m.group(0)),
+            message
+        )
 
         # Log the tool results for debugging
-        import logging
-        logger = logging.getLogger(__name__)
-        if tool_results:
-            logger.info(f"Executed {len(tool_results)} tool calls: {[r['tool'] for r in tool_results]}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Executed %d tool calls: %s", len(tool_results), [r['tool'] for r in tool_results])
 
         return processed_message, tool_results
@@ -3,232 +3,450 @@ AI Reasoning module using LangChain with OpenAI o1 and o4 models.
 This module provides a framework for sequential reasoning and code generation.
 """
 
+import asyncio
+import atexit
+import functools
+import hashlib
+import importlib.resources
 import json
 import logging
 import os
+import re
+import threading
 from typing import Dict, List, Any, Optional, Tuple
 
+import httpx
+import tiktoken
+from asgiref.sync import async_to_sync, sync_to_async
 from django.conf import settings
-from langchain.agents import AgentExecutor, create_openai_tools_agent
+from django.core.cache import cache as django_cache
+from django.db import transaction
+from django.utils import timezone
+from langchain.agents import AgentExecutor
+from langchain.agents.format_scratchpad.openai_tools import format_to_openai_tool_messages
+from langchain.agents.output_parsers.openai_tools import OpenAIToolsAgentOutputParser
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain.schema import SystemMessage, HumanMessage
 from langchain.tools import BaseTool, StructuredTool, tool
+from langchain_core.runnables import RunnablePassthrough
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langchain_openai import ChatOpenAI
+from pydantic_core import from_json
 
 from .models import Project, ReasoningSession, ReasoningStep
 from .file_operations import FileOperations
+from .semantic_cache import SemanticCache
+
+try:
+    from channels.layers import get_channel_layer
+    from .consumers import PROJECT_CHANNELS
+except ImportError:
+    get_channel_layer = None
+    PROJECT_CHANNELS = {}
+
+# Whether every tool WebSocket is served by this process, so events can be sent
+# straight to the connected consumers instead of through a channel-layer group
+TOOL_EVENTS_SINGLE_PROCESS = getattr(settings, 'TOOL_EVENTS_SINGLE_PROCESS', False)
+
+try:
+    # orjson is an optional, faster drop-in for serializing tool output
+    import orjson
+
+    def _dumps_indented(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode('utf-8')
+except ImportError:
+    def _dumps_indented(obj) -> str:
+        return json.dumps(obj, indent=2)
 
 logger = logging.getLogger(__name__)
 
-# System prompts for different reasoning steps
-SYSTEM_PROMPTS = {
-    "planning": """You are an expert software developer and AI assistant specialized in planning coding tasks.
-Your job is to break down complex coding tasks into clear, actionable steps.
-
-IMPORTANT: You MUST format your response as a JSON object with the following structure:
-{
-    "introduction": "Brief introduction to the task",
-    "steps": [
-        {
-            "title": "Step 1: [Step Title]",
-            "description": "Detailed description of what this step involves",
-            "files_involved": ["list", "of", "files", "to", "examine", "or", "modify"],
-            "tools_needed": ["list", "of", "tools", "that", "might", "be", "needed"]
-        },
-        // Additional steps...
-    ],
-    "conclusion": "Brief conclusion or summary"
-}
+# One connection pool shared by every OpenAI client in the process, so calls
+# in a reasoning chain, and the chains of concurrent chat users, reuse open
+# connections instead of repeating TLS handshakes. Requests carry their API
+# key in a header, so one pool serves every key.
+_SHARED_HTTP_CLIENT = httpx.Client(
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+)
+atexit.register(_SHARED_HTTP_CLIENT.close)
 
-IMPORTANT: In this planning step, DO NOT actually execute any tools or implement any code. Your job is ONLY to create a plan that will be executed in later steps. DO NOT use any tool calls in this step.
+# OpenAI REST API, called directly for the Batch API endpoints
+OPENAI_API_BASE = "https://api.openai.com/v1"
+
+# Batch statuses after which no more results will arrive
+_BATCH_FINAL_STATUSES = frozenset({"completed", "failed", "expired", "cancelled"})
+
+# Fixed instructions of the planning prompt
+_PLANNING_INSTRUCTIONS = """IMPORTANT: In this planning step, DO NOT actually execute any tools or implement any code. Your job is ONLY to create a plan that will be executed in later steps.
 
 For each step, specify:
-1. A clear title that summarizes the step
-2. A detailed description of what needs to be done
-3. What files need to be examined or modified
-4. What tools might be needed (file operations, code execution, etc.)
-
-Be thorough but concise. Focus on creating a practical, step-by-step plan that will be executed in later steps.
-""",
-
-    "analysis": """You are an expert code analyst specialized in understanding codebases.
-Examine the provided code carefully and provide insights.
-
-IMPORTANT: You MUST format your response as a JSON object with the following structure:
-{
-    "overview": "Brief overview of the code",
-    "structure": "Description of the overall structure and purpose",
-    "components": [
-        {
-            "name": "Component name",
-            "purpose": "Purpose of this component",
-            "relationships": "How it relates to other components"
-        },
-        // Additional components...
-    ],
-    "issues": [
-        {
-            "description": "Description of the issue",
-            "severity": "high/medium/low",
-            "recommendation": "Suggested fix"
-        },
-        // Additional issues...
-    ],
-    "relevance": "How the code relates to the user's request"
-}
+1. The goal of the step
+2. What files need to be examined or modified
+3. What tools might be needed (read_file, write_file, run_file, etc.)
 
-Be thorough and precise in your analysis. This will be used to guide further actions.
-""",
-
-    "code_generation": """You are an expert software developer specialized in writing high-quality code.
-Generate code based on the provided specifications and analysis.
-
-IMPORTANT: You MUST format your response as a JSON object with the following structure:
-{
-    "overview": "Brief overview of what you're implementing",
-    "files": [
-        {
-            "path": "path/to/file.ext",
-            "content": "Complete content of the file",
-            "description": "Description of what this file does"
-        },
-        // Additional files...
-    ],
-    "explanation": "Explanation of how the code works and any important implementation details",
-    "next_steps": "Suggested next steps after implementation"
+The following tools will be available in later steps, but you should NOT use them now:
+- read_file: Read the content of a file in the project
+- write_file: Write content to a file in the project
+- list_files: List files and directories in a directory
+- run_file: Run a file in the project's container
+- delete_file: Delete a file or directory in the project"""
+
+# Heading separating the context of a step prompt from the step's instruction
+_STEP_HEADING = "\n\n# STEP\n"
+
+# What each step of the chain should do, the last section of its prompt
+_STEP_INSTRUCTIONS = {
+    "planning": "Create a detailed plan to accomplish this task.",
+    "analysis": "Analyze this code in relation to the task.",
+    "code_generation": "Generate the necessary code to implement this task. Use the available tools to read, write, or execute files as needed.",
+    "testing": "Test the implementation and verify it works correctly. Use the run_file tool if needed.",
+    "refinement": "Refine and optimize the implementation. Make any necessary improvements.",
+    "conclusion": "IMPORTANT: In this conclusion step, DO NOT execute any tools. Your job is ONLY to summarize what was accomplished in the previous steps.\n\n"
+                  "Provide a summary of what was accomplished and any next steps or recommendations.",
 }
 
-IMPORTANT: In this code generation step, you SHOULD actually implement the code by using the appropriate tools:
-- Use read_file to examine existing files
-- Use write_file to create or update files
-- Use list_files to explore the directory structure
-- Use other tools as needed to complete the implementation
-
-Your code should be:
-1. Well-structured and organized
-2. Properly commented
-3. Following best practices for the language/framework
-4. Compatible with the existing codebase
-
-Provide complete implementations that can be directly integrated into the project.
-""",
-
-    "code_execution": """You are an expert in executing and testing code.
-
-IMPORTANT: You MUST format your response as a JSON object with the following structure:
-{
-    "execution_plan": "Description of how to run the code",
-    "expected_outcomes": "What you expect to happen when the code runs",
-    "potential_issues": ["List", "of", "potential", "issues"],
-    "test_cases": [
-        {
-            "description": "Description of the test case",
-            "input": "Test input",
-            "expected_output": "Expected output"
-        },
-        // Additional test cases...
-    ],
-    "results": "Interpretation of execution results",
-    "recommendations": "Recommendations based on the results"
-}
+# Tools that only read the project. The tool calls of a model turn run
+# concurrently only if they all use these; any other turn runs in call order.
+_READ_ONLY_TOOLS = frozenset({"read_file", "read_files", "list_files"})
 
-IMPORTANT: In this code execution step, you SHOULD actually run the code by using the appropriate tools:
-- Use run_file to execute the code files
-- Use read_file to examine the content of files if needed
-- Use write_file to make any necessary adjustments to the code
-
-Be precise and focus on practical execution steps.
-""",
-
-    "testing": """You are an expert in software testing.
-
-IMPORTANT: You MUST format your response as a JSON object with the following structure:
-{
-    "test_strategy": "Overall testing strategy",
-    "test_cases": [
-        {
-            "name": "Test case name",
-            "description": "Description of what this test verifies",
-            "input": "Test input",
-            "expected_output": "Expected output",
-            "edge_case": true/false
-        },
-        // Additional test cases...
-    ],
-    "coverage": "Description of test coverage",
-    "issues_found": [
-        {
-            "description": "Description of the issue",
-            "severity": "high/medium/low",
-            "recommendation": "Suggested fix"
-        },
-        // Additional issues...
-    ],
-    "recommendations": "Overall recommendations based on testing"
-}
+# Locks ordering the tool calls of model turns that must not run concurrently,
+# with the number of calls still to run, by id of the turn's message
+_TURN_LOCKS = {}
 
-IMPORTANT: In this testing step, you SHOULD actually create and run tests by using the appropriate tools:
-- Use write_file to create test files
-- Use run_file to execute the tests
-- Use read_file to examine the content of files if needed
-- Use other tools as needed to complete the testing
-
-Be thorough and methodical in your approach to testing.
-""",
-
-    "refinement": """You are an expert in code refinement and optimization.
-Based on the previous steps and feedback, your job is to improve the code.
-
-IMPORTANT: You MUST format your response as a JSON object with the following structure:
-{
-    "overview": "Overview of refinement approach",
-    "improvements": [
-        {
-            "file": "path/to/file.ext",
-            "description": "Description of the improvement",
-            "before": "Code snippet before change",
-            "after": "Code snippet after change",
-            "rationale": "Why this change improves the code"
-        },
-        // Additional improvements...
-    ],
-    "overall_impact": "Description of how these changes improve the codebase",
-    "future_recommendations": "Suggestions for future improvements"
-}
+# Steps that use the o1 model; all others use gpt-4o
+_O1_STEPS = frozenset({"planning", "analysis", "conclusion"})
+_MODEL_FOR_STEP = {step_type: "o1" for step_type in _O1_STEPS}
 
-IMPORTANT: In this refinement step, you SHOULD actually implement the improvements by using the appropriate tools:
-- Use read_file to examine the content of files
-- Use write_file to update files with improvements
-- Use generate_diff and apply_patch for more complex changes
-- Use run_file to verify that the improvements work correctly
-
-Provide specific, actionable improvements and implement them.
-""",
-
-    "conclusion": """You are an expert in summarizing development work.
-
-IMPORTANT: You MUST format your response as a JSON object with the following structure:
-{
-    "summary": "Overall summary of what was accomplished",
-    "key_changes": [
-        {
-            "description": "Description of a key change or improvement",
-            "impact": "Impact of this change"
-        },
-        // Additional key changes...
-    ],
-    "files_modified": ["List", "of", "files", "that", "were", "modified"],
-    "remaining_issues": ["List", "of", "any", "remaining", "issues"],
-    "future_work": ["List", "of", "suggested", "future", "work"],
-    "conclusion": "Final concluding thoughts"
-}
+# Steps answered by the temperature 0 model whose responses may be cached. Tool-using
+# steps (analysis) are only cached when they made no tool calls, so a cached answer
+# never skips a side effect or a read of files that may have changed.
+_CACHEABLE_STEPS = frozenset({"planning", "analysis", "conclusion"})
 
-IMPORTANT: In this conclusion step, DO NOT execute any tools. Your job is ONLY to summarize what was accomplished in the previous steps.
+# Exact-match step cache hits and misses in this process
+STEP_CACHE_STATS = {"hits": 0, "misses": 0}
 
-Be concise but comprehensive in your summary.
-"""
+# How long cached step responses are kept, in seconds
+STEP_CACHE_TIMEOUT = getattr(settings, 'REASONING_STEP_CACHE_TIMEOUT', 60 * 60 * 24)
+
+# Minimum prompt similarity for reusing a cached response (None disables the semantic cache)
+SEMANTIC_CACHE_THRESHOLD = getattr(settings, 'REASONING_SEMANTIC_CACHE_THRESHOLD', None)
+
+# Steps whose responses the semantic cache may reuse for a similar prompt. Never
+# planning: tasks that differ in a single file name look alike to embeddings,
+# and later steps would act on the other task's plan.
+_SEMANTIC_CACHE_STEPS = frozenset({"conclusion"})
+
+# Fields written when a step finishes; updated_at must be listed for auto_now to apply
+_STEP_RESULT_FIELDS = ["response", "summary", "is_complete", "updated_at"]
+
+# Streamed tokens are forwarded to the WebSocket in batches of at least this many characters
+STEP_DELTA_BATCH_CHARS = 256
+
+# Responses longer than this many characters are condensed before being embedded in later prompts
+STEP_SUMMARY_THRESHOLD = 2048
+
+# Context window of each model, in tokens
+_CONTEXT_WINDOWS = {"o1": 200000, "gpt-4o": 128000}
+
+# Tokens kept free in the context window for the response and the tool-calling scratchpad
+PROMPT_OUTPUT_RESERVE_TOKENS = 16384
+
+# Marker for the lines dropped from the middle of a file that does not fit into a prompt
+_TRUNCATION_MARKER = "...[truncated]..."
+
+# A JSON response wrapped in a Markdown code fence
+_JSON_FENCE_RE = re.compile(r"```(?:json)?\s*([\s\S]*?)```")
+
+# Tools offered to the agent of each step type; step types not listed get every tool.
+# Planning and conclusion are answered without tools.
+_STEP_TOOL_NAMES = {
+    "planning": (),
+    "analysis": ("read_file", "read_files", "list_files"),
+    "testing": ("read_file", "read_files", "list_files", "write_file", "run_file", "pip_install"),
+    "code_execution": ("read_file", "read_files", "write_file", "run_file", "pip_install"),
+    "conclusion": (),
 }
 
+# Keywords in the task description that decide which reasoning steps run
+_ANALYSIS_RE = re.compile(r"analyze|examine|understand|review")
+_CODE_GENERATION_RE = re.compile(r"create|implement|write|add|generate")
+_TESTING_RE = re.compile(r"run|execute|test")
+_REFINEMENT_RE = re.compile(r"improve|optimize|refactor")
+
+# Phrases in the plan indicating the task was already completed during planning
+_TASK_COMPLETED_RE = re.compile("|".join(re.escape(indicator) for indicator in [
+    "task has been completed",
+    "task is now complete",
+    "all files have been deleted",
+    "file has been deleted",
+    "files have been deleted",
+    "successfully deleted",
+    "deletion complete",
+    "task completed"
+]))
+
+# Step types with their own system prompt in users/prompts/<step_type>.txt
+PROMPT_STEP_TYPES = frozenset({
+    "planning",
+    "analysis",
+    "code_generation",
+    "code_execution",
+    "testing",
+    "refinement",
+    "conclusion",
+})
+
+
+def _openai_request(api_key: str, method: str, path: str, **kwargs) -> httpx.Response:
+    """
+    Call the OpenAI REST API with the shared connection pool.
+
+    Args:
+        api_key: OpenAI API key
+        method: HTTP method
+        path: Path below OPENAI_API_BASE
+        **kwargs: Passed on to httpx
+
+    Returns:
+        The response, after raising for error statuses
+    """
+    response = _SHARED_HTTP_CLIENT.request(
+        method, f"{OPENAI_API_BASE}{path}",
+        headers={"Authorization": f"Bearer {api_key}"},
+        timeout=120,
+        **kwargs
+    )
+    response.raise_for_status()
+    return response
+
+
+@functools.lru_cache(maxsize=None)
+def _get_encoding() -> tiktoken.Encoding:
+    """Get the tokenizer used to measure prompts, loading it on first use."""
+    try:
+        return tiktoken.encoding_for_model("gpt-4o")
+    except KeyError:
+        # tiktoken releases before gpt-4o; close enough for a length check
+        return tiktoken.get_encoding("cl100k_base")
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a text.
+
+    Args:
+        text: Text to measure
+
+    Returns:
+        Number of tokens
+    """
+    return len(_get_encoding().encode(text, disallowed_special=()))
+
+
+def fit_to_token_budget(text: str, budget: int) -> str:
+    """
+    Shorten a text to at most budget tokens by dropping lines from its middle.
+
+    The head and tail of a file usually say the most about it (imports,
+    definitions, entry point), so equal numbers of lines are kept from both
+    ends, as many as fit.
+
+    Args:
+        text: Text to shorten
+        budget: Maximum number of tokens
+
+    Returns:
+        The text itself if it fits, otherwise its head and tail around a marker
+    """
+    if count_tokens(text) <= budget:
+        return text
+
+    lines = text.splitlines()
+
+    def shortened(keep: int) -> str:
+        return "\n".join(lines[:keep] + [_TRUNCATION_MARKER] + lines[len(lines) - keep:])
+
+    # Binary search for the most lines per end that still fit
+    low, high = 0, len(lines) // 2
+    while low < high:
+        keep = (low + high + 1) // 2
+        if count_tokens(shortened(keep)) <= budget:
+            low = keep
+        else:
+            high = keep - 1
+    return shortened(low)
+
+
+@functools.lru_cache(maxsize=None)
+def get_prompt(step_type: str) -> str:
+    """
+    Get the system prompt for a reasoning step, loading it on first use.
+
+    Args:
+        step_type: Type of reasoning step (unknown types use the planning prompt)
+
+    Returns:
+        The system prompt text
+    """
+    if step_type not in PROMPT_STEP_TYPES:
+        step_type = "planning"
+    return (importlib.resources.files("users.prompts") / f"{step_type}.txt").read_text(encoding="utf-8")
+
+
+def _parse_response(text: str) -> Any:
+    """
+    Parse JSON produced by a model.
+
+    Incomplete JSON, such as a response that is still streaming or was cut
+    off, is parsed as far as it goes.
+
+    Args:
+        text: JSON text
+
+    Returns:
+        The parsed value
+
+    Raises:
+        ValueError: If the text is not valid JSON
+    """
+    return from_json(text, allow_partial=True)
+
+
+def _load_json_response(response: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse a step response as the JSON object its system prompt asks for.
+
+    Args:
+        response: Raw response text, optionally wrapped in a code fence
+
+    Returns:
+        The parsed object, or None if the response is not a JSON object
+    """
+    match = _JSON_FENCE_RE.search(response)
+    try:
+        data = _parse_response(match.group(1) if match else response)
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def summarize_response(step_type: str, response: str) -> str:
+    """
+    Condense a long step response for use in the prompts of later steps.
+
+    The key fields of the JSON structure required by the step's system prompt
+    are extracted (dropping e.g. full file contents). Responses that are not
+    JSON are truncated instead.
+
+    Args:
+        step_type: Type of reasoning step that produced the response
+        response: The step response
+
+    Returns:
+        The summary, or an empty string if the response is short enough to pass on as is
+    """
+    if len(response) <= STEP_SUMMARY_THRESHOLD:
+        return ""
+
+    data = _load_json_response(response)
+    lines = []
+    if data is not None:
+        if step_type == "planning":
+            lines.append(str(data.get("introduction", "")))
+            for step in data.get("steps") or []:
+                if isinstance(step, dict):
+                    lines.append(f"- {step.get('title', '')}: {step.get('description', '')}")
+                    if step.get("files_involved"):
+                        lines.append(f"  Files: {', '.join(map(str, step['files_involved']))}")
+            lines.append(str(data.get("conclusion", "")))
+        elif step_type == "analysis":
+            lines.append(str(data.get("overview", "")))
+            lines.append(str(data.get("relevance", "")))
+            for issue in data.get("issues") or []:
+                if isinstance(issue, dict):
+                    lines.append(f"- Issue: {issue.get('description', '')} "
+                                 f"Recommendation: {issue.get('recommendation', '')}")
+        elif step_type == "code_generation":
+            lines.append(str(data.get("overview", "")))
+            for file in data.get("files") or []:
+                if isinstance(file, dict):
+                    lines.append(f"- {file.get('path', '')}: {file.get('description', '')}")
+            lines.append(str(data.get("explanation", "")))
+        else:
+            lines.extend(value for value in data.values() if isinstance(value, str))
+
+    summary = "\n".join(line for line in lines if line.strip())
+    if summary:
+        return summary
+    return response[:STEP_SUMMARY_THRESHOLD] + "\n[... truncated]"
+
+
+@functools.lru_cache(maxsize=None)
+def get_system_message(step_type: str) -> SystemMessage:
+    """
+    Get the system prompt for a reasoning step as a message, building it once per process.
+
+    Args:
+        step_type: Type of reasoning step
+
+    Returns:
+        The system message
+    """
+    return SystemMessage(content=get_prompt(step_type))
+
+
+@functools.lru_cache(maxsize=None)
+def get_prompt_template(step_type: str) -> ChatPromptTemplate:
+    """
+    Get the agent prompt template for a reasoning step, building it once per process.
+
+    Args:
+        step_type: Type of reasoning step
+
+    Returns:
+        The prompt template
+    """
+    return ChatPromptTemplate.from_messages([
+        get_system_message(step_type),
+        MessagesPlaceholder(variable_name="chat_history"),
+        HumanMessage(content="{input}"),
+        MessagesPlaceholder(variable_name="agent_scratchpad")
+    ])
+
+
+class _OrderedToolsAgentExecutor(AgentExecutor):
+    """
+    AgentExecutor that runs the tool calls of a model turn concurrently only
+    when all of them are read-only.
+
+    On the async path AgentExecutor starts every tool call of a turn at once.
+    A turn that also writes files or runs commands (e.g. write_file then
+    run_file on the same file) has to run in the order the model issued the
+    calls, so its calls take a lock of the turn one after the other.
+    """
+
+    async def _aperform_agent_action(self, name_to_tool_map, color_mapping, agent_action, run_manager=None):
+        # Every action of a turn carries the model message with all of the turn's tool calls
+        message_log = getattr(agent_action, "message_log", None)
+        turn = message_log[-1] if message_log else None
+        tool_calls = turn.additional_kwargs.get("tool_calls", []) if turn is not None else []
+        if len(tool_calls) <= 1 or all(call["function"]["name"] in _READ_ONLY_TOOLS for call in tool_calls):
+            return await super()._aperform_agent_action(
+                name_to_tool_map, color_mapping, agent_action, run_manager
+            )
+
+        # asyncio.gather starts the actions in the order of the calls, and the
+        # lock is handed on first-come first-served, so they run in that order
+        entry = _TURN_LOCKS.setdefault(id(turn), [asyncio.Lock(), len(tool_calls)])
+        try:
+            async with entry[0]:
+                return await super()._aperform_agent_action(
+                    name_to_tool_map, color_mapping, agent_action, run_manager
+                )
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                _TURN_LOCKS.pop(id(turn), None)
+
 
 class AIReasoning:
     """
@@ -255,8 +473,11 @@ class AIReasoning:
             model="o1",
             temperature=0,
             api_key=api_key,
+            streaming=True,
+            # The system prompts require a JSON object; have the API enforce it
+            model_kwargs={"response_format": {"type": "json_object"}},
+            http_client=_SHARED_HTTP_CLIENT,
             # Explicitly set parameters that might cause issues to None
-            http_client=None,
             max_retries=None,
             timeout=None,
             default_headers=None,
@@ -269,8 +490,11 @@ class AIReasoning:
             model="gpt-4o",
             temperature=0.2,
             api_key=api_key,
+            streaming=True,
+            # The system prompts require a JSON object; have the API enforce it
+            model_kwargs={"response_format": {"type": "json_object"}},
+            http_client=_SHARED_HTTP_CLIENT,
             # Explicitly set parameters that might cause issues to None
-            http_client=None,
             max_retries=None,
             timeout=None,
             default_headers=None,
@@ -280,9 +504,44 @@ class AIReasoning:
         # Initialize file operations
         self.file_ops = FileOperations(project, project.user)
 
+        # Serializes tools that execute commands in the project's container
+        self._container_lock = threading.Lock()
+
         # Initialize tools
         self.tools = self._create_tools()
 
+        # OpenAI schemas of the tools, converted once rather than for every agent
+        self._tool_schemas = {tool.name: convert_to_openai_tool(tool) for tool in self.tools}
+
+        # Tool subsets per step type, so agents only receive the schemas they can use
+        tools_by_name = {tool.name: tool for tool in self.tools}
+        self._tools_by_step: Dict[str, List[BaseTool]] = {
+            step_type: [tools_by_name[name] for name in names]
+            for step_type, names in _STEP_TOOL_NAMES.items()
+        }
+
+        # Agents built so far, keyed by step type
+        self._agent_cache: Dict[str, AgentExecutor] = {}
+
+        # Semantic cache for responses of summary steps with similar prompts
+        self._semantic_cache = None
+        if SEMANTIC_CACHE_THRESHOLD is not None:
+            self._semantic_cache = SemanticCache(
+                api_key=api_key,
+                threshold=SEMANTIC_CACHE_THRESHOLD,
+                timeout=STEP_CACHE_TIMEOUT,
+                http_client=_SHARED_HTTP_CLIENT,
+            )
+
+        # Optional callable(session, step, status, error) told about every step status change
+        self.step_listener = None
+
+        # Channel layer used for WebSocket notifications (None if channels is unavailable),
+        # with its group_send and send wrapped for sync callers once rather than per notification
+        self._channel_layer = get_channel_layer() if get_channel_layer is not None else None
+        self._group_send = async_to_sync(self._channel_layer.group_send) if self._channel_layer else None
+        self._channel_send = async_to_sync(self._channel_layer.send) if self._channel_layer else None
+
     def _create_tools(self) -> List[BaseTool]:
         """
         Create tools for the agent to use.
@@ -306,6 +565,25 @@ class AIReasoning:
                 raise ValueError(result["message"])
             return result["content"]
 
+        @tool
+        def read_files(file_paths: str) -> str:
+            """
+            Read the content of several files in the project at once.
+
+            Args:
+                file_paths: Comma-separated list of file paths relative to the project root
+
+            Returns:
+                JSON string mapping each file path to its content, or to an error message
+            """
+            result = self.file_ops.read_files(file_paths)
+            if "files" not in result:
+                raise ValueError(result["message"])
+            return _dumps_indented({
+                file["file_path"]: file["content"] if file["status"] == "success" else f"Error: {file['message']}"
+                for file in result["files"]
+            })
+
         @tool
         def write_file(file_path: str, content: str) -> str:
             """
@@ -318,15 +596,7 @@ class AIReasoning:
             Returns:
                 Success message
             """
-            # Check if file exists
-            read_result = self.file_ops.read_file(file_path)
-            if read_result["status"] == "success":
-                # Update existing file
-                result = self.file_ops.update_file(file_path, content)
-            else:
-                # Create new file
-                result = self.file_ops.create_file(file_path, content)
-
+            result = self.file_ops.write_file(file_path, content)
             if result["status"] == "error":
                 raise ValueError(result["message"])
             return result["message"]
@@ -345,7 +615,7 @@ class AIReasoning:
             result = self.file_ops.list_files(directory_path)
             if result["status"] == "error":
                 raise ValueError(result["message"])
-            return json.dumps(result["items"], indent=2)
+            return _dumps_indented(result["items"])
 
         @tool
         def run_file(file_path: str) -> str:
@@ -358,7 +628,13 @@ class AIReasoning:
             Returns:
                 Execution results
             """
-            result = self.file_ops.run_file(file_path)
+            # Forward output to the project's WebSocket group while the file runs
+            def on_output(stream: str, line: str):
+                self._send_tool_output("run_file", stream, line)
+
+            # Tool calls of one turn run concurrently; commands in the container run one at a time
+            with self._container_lock:
+                result = self.file_ops.run_file_stream(file_path, on_output=on_output)
             if result["status"] == "error":
                 raise ValueError(result["message"])
 
@@ -433,7 +709,8 @@ class AIReasoning:
             Returns:
                 Result of the installation
             """
-            result = self.file_ops.pip_install(packages)
+            with self._container_lock:
+                result = self.file_ops.pip_install(packages)
             if result["status"] == "error":
                 raise ValueError(result["message"])
 
@@ -448,6 +725,7 @@ class AIReasoning:
 
         return [
             read_file,
+            read_files,
             write_file,
             list_files,
             run_file,
@@ -457,13 +735,14 @@ class AIReasoning:
             pip_install
         ]
 
-    def create_session(self, title: str, description: str = "") -> ReasoningSession:
+    def create_session(self, title: str, description: str = "", mode: str = "interactive") -> ReasoningSession:
         """
         Create a new reasoning session.
 
         Args:
             title: Title for the reasoning session
             description: Optional description
+            mode: "interactive" or "batch"
 
         Returns:
             Created ReasoningSession instance
@@ -472,7 +751,8 @@ class AIReasoning:
             project=self.project,
             user=self.project.user,
             title=title,
-            description=description
+            description=description,
+            mode=mode
         )
 
     def create_agent(self, step_type: str) -> AgentExecutor:
@@ -485,47 +765,91 @@ class AIReasoning:
         Returns:
             LangChain AgentExecutor
         """
-        # Select the appropriate LLM based on step type
-        if step_type in ["planning", "analysis", "conclusion"]:
-            llm = self.llm_o1  # Use o1 for planning and analysis
-        else:
-            llm = self.llm_o4  # Use o4 for code generation and execution
+        # The LLMs, tools and prompts don't change after init, so each agent is built once
+        agent_executor = self._agent_cache.get(step_type)
+        if agent_executor is None:
+            agent_executor = self._agent_cache[step_type] = self._build_agent(step_type)
+        return agent_executor
 
-        # Get the system prompt for this step type
-        system_prompt = SYSTEM_PROMPTS.get(step_type, SYSTEM_PROMPTS["planning"])
+    def _build_agent(self, step_type: str) -> AgentExecutor:
+        """
+        Build a new agent for a specific reasoning step type.
 
-        # Create the prompt template
-        prompt = ChatPromptTemplate.from_messages([
-            SystemMessage(content=system_prompt),
-            MessagesPlaceholder(variable_name="chat_history"),
-            HumanMessage(content="{input}"),
-            MessagesPlaceholder(variable_name="agent_scratchpad")
-        ])
+        Args:
+            step_type: Type of reasoning step
 
-        # Select the appropriate tools based on step type
-        if step_type == "planning" or step_type == "conclusion":
-            # Planning and conclusion steps should not use tools
-            tools = []
-        elif step_type == "analysis":
-            # Analysis step should only use read_file and list_files
-            tools = [tool for tool in self.tools if tool.name in ["read_file", "list_files"]]
-        else:
-            # All other steps can use all tools
-            tools = self.tools
+        Returns:
+            LangChain AgentExecutor
+        """
+        # Select the appropriate LLM based on step type
+        # (o1 for planning and analysis, o4 for code generation and execution)
+        llm = self.llm_o1 if step_type in _O1_STEPS else self.llm_o4
 
-        # Create the agent
-        agent = create_openai_tools_agent(llm, tools, prompt)
+        # Get the prompt template for this step type
+        prompt = get_prompt_template(step_type)
+
+        # Select the appropriate tools based on step type
+        tools = self._tools_by_step.get(step_type, self.tools)
+
+        # Create the agent (equivalent to create_openai_tools_agent, using the precomputed schemas)
+        if tools:
+            llm = llm.bind(tools=[self._tool_schemas[tool.name] for tool in tools])
+        agent = (
+            RunnablePassthrough.assign(
+                agent_scratchpad=lambda x: format_to_openai_tool_messages(x["intermediate_steps"])
+            )
+            | prompt
+            | llm
+            | OpenAIToolsAgentOutputParser()
+        )
 
         # Create the agent executor
-        return AgentExecutor(
+        return _OrderedToolsAgentExecutor(
             agent=agent,
             tools=tools,
             verbose=True,
             handle_parsing_errors=True
         )
 
+    def _next_step_number(self, session: ReasoningSession, count: int = 1) -> int:
+        """
+        Reserve the numbers for the next steps in a session.
+
+        Args:
+            session: ReasoningSession instance
+            count: How many consecutive numbers to reserve
+
+        Returns:
+            The first reserved step number
+        """
+        # A counter on the session hands out numbers atomically, so concurrent steps never collide
+        return session.reserve_step_numbers(count)
+
+    @staticmethod
+    def _step_cache_key(step_type: str, model_used: str, prompt: str, tools: List[BaseTool]) -> str:
+        """
+        Build the cache key for a step's response.
+
+        Args:
+            step_type: Type of reasoning step
+            model_used: Model answering the step
+            prompt: Prompt for the step
+            tools: Tools available to the step
+
+        Returns:
+            Cache key for the response
+        """
+        key_data = json.dumps({
+            "model": model_used,
+            "system": get_prompt(step_type),
+            "prompt": prompt,
+            "tools": sorted(tool.name for tool in tools),
+        }, sort_keys=True)
+        return f"reasoning_step:{hashlib.sha256(key_data.encode('utf-8')).hexdigest()}"
+
     def execute_step(self, session: ReasoningSession, step_type: str,
-                    prompt: str, step_number: Optional[int] = None) -> ReasoningStep:
+                    prompt: str, step_number: Optional[int] = None,
+                    cache: bool = True) -> ReasoningStep:
         """
         Execute a reasoning step.
 
@@ -534,14 +858,14 @@ class AIReasoning:
             step_type: Type of reasoning step
             prompt: Prompt for the step
             step_number: Optional step number (auto-incremented if not provided)
+            cache: Whether to reuse and store responses of deterministic steps
 
         Returns:
             Created ReasoningStep instance with results
         """
         # Determine step number if not provided
         if step_number is None:
-            last_step = session.steps.order_by('-step_number').first()
-            step_number = 1 if last_step is None else last_step.step_number + 1
+            step_number = self._next_step_number(session)
 
         # Create the step record
         step = ReasoningStep.objects.create(
@@ -549,42 +873,80 @@ class AIReasoning:
             step_number=step_number,
             step_type=step_type,
             prompt=prompt,
-            model_used="o1" if step_type in ["planning", "analysis", "conclusion"] else "gpt-4o"
+            model_used=_MODEL_FOR_STEP.get(step_type, "gpt-4o")
         )
 
+        # Reuse the response of an identical (or, with the semantic cache, similar)
+        # earlier step if there is one
+        cache_key = None
+        prompt_embedding = None
+        step_tools = self._tools_by_step.get(step_type, self.tools)
+        llm = self.llm_o1 if step_type in _O1_STEPS else self.llm_o4
+        if cache and step_type in _CACHEABLE_STEPS and llm.temperature == 0:
+            cache_key = self._step_cache_key(step_type, step.model_used, prompt, step_tools)
+            cached_response = django_cache.get(cache_key)
+            STEP_CACHE_STATS["hits" if cached_response is not None else "misses"] += 1
+            # Similar (rather than identical) prompts are only trusted for tool-free
+            # summary steps. Only the context is embedded: the step's fixed
+            # instruction would make every prompt look alike.
+            if (cached_response is None and self._semantic_cache is not None and not step_tools
+                    and step_type in _SEMANTIC_CACHE_STEPS):
+                cached_response, prompt_embedding = self._semantic_cache.lookup(
+                    session.project_id, step_type, prompt.rsplit(_STEP_HEADING, 1)[0]
+                )
+            if cached_response is not None:
+                step.response = cached_response
+                step.summary = summarize_response(step_type, cached_response)
+                step.is_complete = True
+                step.save(update_fields=_STEP_RESULT_FIELDS)
+
+                self._send_step_notification(session, step, "completed")
+                return step
+
         # Send a WebSocket notification that the step has started
         self._send_step_notification(session, step, "started")
 
         try:
             # For planning and conclusion steps, use a direct call to the LLM without tools
+            used_tools = False
             if step_type == "planning" or step_type == "conclusion":
-                # Select the appropriate LLM
-                llm = self.llm_o1
-
-                # Get the system prompt for this step type
-                system_prompt = SYSTEM_PROMPTS.get(step_type, SYSTEM_PROMPTS["planning"])
-
-                # Create a direct message to the LLM
+                # Create a direct message to the LLM, reusing the step type's system message
                 messages = [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": prompt}
+                    get_system_message(step_type),
+                    HumanMessage(content=prompt)
                 ]
 
-                # Call the LLM directly
-                response = llm.invoke(messages)
-
-                # Extract the response content
-                output = response.content
+                # Call the LLM directly, forwarding tokens as they arrive in batches
+                # rather than one group_send per token. Whatever is still pending at
+                # the end is covered by the "completed" notification, which carries
+                # the full response.
+                output = ""
+                pending = ""
+                for chunk in llm.stream(messages):
+                    if not chunk.content:
+                        continue
+                    output += chunk.content
+                    pending += chunk.content
+                    if len(pending) >= STEP_DELTA_BATCH_CHARS:
+                        self._send_step_delta(session, step, pending)
+                        pending = ""
             else:
                 # For all other steps, use the agent with tools
                 agent = self.create_agent(step_type)
-                response = agent.invoke({"input": prompt})
-                output = response.get("output", "")
+                output, used_tools = async_to_sync(self._astream_agent_outputs)(
+                    agent, prompt, functools.partial(self._send_step_delta, session, step)
+                )
 
             # Update the step with the response
             step.response = output
+            step.summary = summarize_response(step_type, output)
             step.is_complete = True
-            step.save()
+            step.save(update_fields=_STEP_RESULT_FIELDS)
+
+            if cache_key is not None and not used_tools:
+                django_cache.set(cache_key, output, STEP_CACHE_TIMEOUT)
+            if prompt_embedding is not None:
+                self._semantic_cache.insert(session.project_id, step_type, prompt_embedding, output)
 
             # Send a WebSocket notification that the step has completed
             self._send_step_notification(session, step, "completed")
@@ -594,13 +956,84 @@ class AIReasoning:
         except Exception as e:
             logger.exception(f"Error executing reasoning step: {str(e)}")
             step.error = str(e)
-            step.save()
+            step.save(update_fields=["error", "updated_at"])
 
             # Send a WebSocket notification that the step has failed
             self._send_step_notification(session, step, "failed", error=str(e))
 
             raise
 
+    @staticmethod
+    async def _astream_agent_outputs(agent: AgentExecutor, prompt: str, send_delta) -> Tuple[str, bool]:
+        """
+        Run an agent through its async interface, forwarding model tokens as they arrive.
+
+        On the async path the tool calls of a model turn that only reads files
+        run concurrently (each sync tool in a worker thread); turns that write
+        files or run commands keep the order of their calls.
+
+        The agent's own stream only yields its output once it has finished, so
+        the tokens are taken from the chat model's stream events instead. They
+        are sent in batches of STEP_DELTA_BATCH_CHARS while the agent runs;
+        whatever is still pending at the end is covered by the "completed"
+        notification, which carries the full response.
+
+        Args:
+            agent: The agent executor to run
+            prompt: Prompt for the step
+            send_delta: Sync callable invoked with each batch of new text
+
+        Returns:
+            Tuple of (the agent's output, whether it called any tools)
+        """
+        send_delta = sync_to_async(send_delta)
+        root_run_id = None
+        output = ""
+        used_tools = False
+        pending = ""
+        async for event in agent.astream_events({"input": prompt}, version="v1"):
+            if root_run_id is None:
+                root_run_id = event["run_id"]
+
+            if event["event"] == "on_chat_model_stream":
+                content = event["data"]["chunk"].content
+                if not content:
+                    continue
+                pending += content
+                if len(pending) >= STEP_DELTA_BATCH_CHARS:
+                    await send_delta(pending)
+                    pending = ""
+            elif event["event"] == "on_chain_stream" and event["run_id"] == root_run_id:
+                # A chunk of the agent's own stream: tool actions, their results, or the output
+                chunk = event["data"]["chunk"]
+                if chunk.get("actions"):
+                    used_tools = True
+                if chunk.get("output"):
+                    output += chunk["output"]
+        return output, used_tools
+
+    def _send_to_project(self, project_id: int, message: Dict[str, Any]):
+        """
+        Send an event to the tool WebSocket consumers of a project.
+
+        When every consumer runs in this process (TOOL_EVENTS_SINGLE_PROCESS),
+        the usual single consumer gets the event with one direct send, and
+        nothing is sent if none is connected. Otherwise the event goes through
+        the project's channel-layer group.
+
+        Args:
+            project_id: ID of the project
+            message: Channel-layer message, with the consumer handler as "type"
+        """
+        if TOOL_EVENTS_SINGLE_PROCESS:
+            channel_names = tuple(PROJECT_CHANNELS.get(project_id, ()))
+            if not channel_names:
+                return
+            if len(channel_names) == 1:
+                self._channel_send(channel_names[0], message)
+                return
+        self._group_send(f"tools_{project_id}", message)
+
     def _send_step_notification(self, session: ReasoningSession, step: ReasoningStep, status: str, error: str = None):
         """
         Send a WebSocket notification about a reasoning step.
@@ -611,16 +1044,18 @@ class AIReasoning:
             status: The status of the step (started, completed, failed)
             error: Optional error message
         """
-        try:
-            # Import here to avoid circular imports
-            from channels.layers import get_channel_layer
-            from asgiref.sync import async_to_sync
+        if self.step_listener is not None:
+            try:
+                self.step_listener(session, step, status, error)
+            except Exception as e:
+                logger.exception(f"Error in reasoning step listener: {str(e)}")
 
-            # Get the channel layer
-            channel_layer = get_channel_layer()
+        if self._group_send is None:
+            return
 
+        try:
             # Get the project ID
-            project_id = session.project.id
+            project_id = session.project_id
 
             # Prepare step data
             step_data = {
@@ -639,173 +1074,353 @@ class AIReasoning:
             if status == 'failed' and error:
                 step_data['error'] = error
 
-            # Send the notification to the group
-            async_to_sync(channel_layer.group_send)(
-                f"tools_{project_id}",
-                {
-                    "type": "reasoning_step",
-                    "session_id": session.id,
-                    "step": step_data
-                }
-            )
+            # Send the notification to the project's consumers
+            self._send_to_project(project_id, {
+                "type": "reasoning_step",
+                "session_id": session.id,
+                "step": step_data
+            })
 
             logger.info(f"Sent WebSocket notification for reasoning step: {step.step_type} ({status})")
         except Exception as e:
             logger.exception(f"Error sending WebSocket notification for reasoning step: {str(e)}")
 
-    def execute_reasoning_chain(self, task_description: str,
-                               context: Optional[Dict[str, Any]] = None) -> ReasoningSession:
+    def _send_step_delta(self, session: ReasoningSession, step: ReasoningStep, delta: str):
         """
-        Execute a full reasoning chain for a task.
+        Send a WebSocket notification with a partial response for a running step.
 
         Args:
-            task_description: Description of the task to perform
-            context: Optional context information (e.g., current file)
+            session: The reasoning session
+            step: The reasoning step
+            delta: The newly generated piece of the response
+        """
+        if self._group_send is None:
+            return
 
-        Returns:
-            Completed ReasoningSession instance
+        try:
+            # Send the delta to the project's consumers
+            self._send_to_project(session.project_id, {
+                "type": "reasoning_step_delta",
+                "session_id": session.id,
+                "step_id": step.id,
+                "delta": delta
+            })
+        except Exception as e:
+            logger.exception(f"Error sending WebSocket delta for reasoning step: {str(e)}")
+
+    def _send_tool_output(self, tool_name: str, stream: str, chunk: str):
         """
-        # Create a new session
-        session = self.create_session(
-            title=task_description[:100] + "..." if len(task_description) > 100 else task_description
-        )
+        Send a WebSocket notification with a line of output from a running tool.
+
+        Args:
+            tool_name: Name of the tool producing the output
+            stream: Output stream the line came from (stdout or stderr)
+            chunk: The line of output
+        """
+        if self._group_send is None:
+            return
 
         try:
-            # Step 1: Planning (always executed)
-            planning_prompt = f"""Task: {task_description}
+            self._send_to_project(self.project.id, {
+                "type": "tool_output",
+                "tool_name": tool_name,
+                "stream": stream,
+                "chunk": chunk
+            })
+        except Exception as e:
+            logger.exception(f"Error sending WebSocket tool output: {str(e)}")
 
-Create a detailed plan to accomplish this task.
+    @staticmethod
+    def _add_sections(context_text: str, sections: List[Tuple[str, str]]) -> str:
+        """
+        Append context sections to the shared part of step prompts.
 
-IMPORTANT: In this planning step, DO NOT actually execute any tools or implement any code. Your job is ONLY to create a plan that will be executed in later steps.
+        Provider prompt caching only matches identical prefixes, so prompts
+        start with the task, then the context sections in a fixed order, and
+        end with the step-specific instruction. Steps that share context reuse
+        one rendered string for it rather than rendering it for each prompt.
 
-For each step, specify:
-1. The goal of the step
-2. What files need to be examined or modified
-3. What tools might be needed (read_file, write_file, run_file, etc.)
+        Args:
+            context_text: Context rendered so far, starting with "# TASK"
+            sections: (title, content) pairs of context to add
 
-The following tools will be available in later steps, but you should NOT use them now:
-- read_file: Read the content of a file in the project
-- write_file: Write content to a file in the project
-- list_files: List files and directories in a directory
-- run_file: Run a file in the project's container
-- delete_file: Delete a file or directory in the project
-"""
-            if context and "current_file" in context:
-                planning_prompt += f"\n\nThe user is currently working on: {context['current_file']}"
+        Returns:
+            The extended context text
+        """
+        return context_text + "".join(f"\n\n# {title}\n{content}" for title, content in sections)
 
-            planning_step = self.execute_step(session, "planning", planning_prompt)
-            plan = planning_step.response
+    @staticmethod
+    def _step_prompt(context_text: str, step_type: str) -> str:
+        """
+        Build a step prompt from the shared context and the step's instruction.
 
-            # Check if the task is already completed in the planning step
-            # Look for indicators that the task was simple and already completed
-            task_completed_indicators = [
-                "task has been completed",
-                "task is now complete",
-                "all files have been deleted",
-                "file has been deleted",
-                "files have been deleted",
-                "successfully deleted",
-                "deletion complete",
-                "task completed"
-            ]
-
-            task_already_completed = any(indicator.lower() in plan.lower() for indicator in task_completed_indicators)
+        Args:
+            context_text: Rendered context, see _add_sections()
+            step_type: Type of reasoning step
 
-            # Determine which steps to execute based on the task description and planning response
-            needs_analysis = (context and "current_file" in context and "current_file_content" in context and
-                             any(keyword in task_description.lower() for keyword in ["analyze", "examine", "understand", "review"]))
+        Returns:
+            The prompt text
+        """
+        return f"{context_text}{_STEP_HEADING}{_STEP_INSTRUCTIONS[step_type]}"
 
-            needs_code_generation = (not task_already_completed and
-                                    any(keyword in task_description.lower() for keyword in ["create", "implement", "write", "add", "generate"]))
+    def _planning_prompt(self, task_description: str, context: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Build the prompt of the planning step.
 
-            needs_testing = (not task_already_completed and
-                            any(keyword in task_description.lower() for keyword in ["run", "execute", "test"]))
+        The fixed instructions go before the task so they extend the cacheable prefix.
 
-            needs_refinement = (not task_already_completed and
-                               any(keyword in task_description.lower() for keyword in ["improve", "optimize", "refactor"]))
+        Args:
+            task_description: Description of the task
+            context: Optional context information (e.g., current file)
 
-            # Step 2: Analysis (if needed)
-            if needs_analysis:
-                analysis_prompt = f"""
-                Task: {task_description}
+        Returns:
+            The prompt text
+        """
+        planning_context = f"# TASK\n{task_description}"
+        if context and "current_file" in context:
+            planning_context = self._add_sections(planning_context, [
+                ("CURRENT FILE", f"The user is currently working on: {context['current_file']}")
+            ])
+        return _PLANNING_INSTRUCTIONS + "\n\n" + self._step_prompt(planning_context, "planning")
+
+    def execute_reasoning_chain_batch(self, tasks: List[str],
+                                      context: Optional[Dict[str, Any]] = None) -> List[ReasoningSession]:
+        """
+        Submit the planning step of several tasks to the OpenAI Batch API.
 
-                Plan: {plan}
+        Batch requests cost less but complete within 24 hours, so this is meant
+        for work nobody waits on. Only planning is submitted: every later step
+        depends on the plan or calls tools, which a batch request cannot do.
+        The results are written back by collect_batch().
 
-                Current file: {context['current_file']}
+        Args:
+            tasks: Descriptions of the tasks to plan
+            context: Optional context information shared by all tasks
 
-                File content:
-                ```
-                {context['current_file_content']}
-                ```
+        Returns:
+            The created sessions, each with a pending planning step
+        """
+        llm = self.llm_o1 if "planning" in _O1_STEPS else self.llm_o4
+        system_prompt = get_prompt("planning")
+
+        sessions = []
+        steps = []
+        lines = []
+        for task_description in tasks:
+            session = self.create_session(
+                title=task_description[:100] + "..." if len(task_description) > 100 else task_description,
+                description=task_description,
+                mode="batch"
+            )
+            step = ReasoningStep.objects.create(
+                session=session,
+                step_number=self._next_step_number(session),
+                step_type="planning",
+                prompt=self._planning_prompt(task_description, context),
+                model_used=_MODEL_FOR_STEP.get("planning", "gpt-4o")
+            )
+            sessions.append(session)
+            steps.append(step)
+            lines.append(json.dumps({
+                "custom_id": f"{session.id}:{step.step_number}",
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": llm.model_name,
+                    "temperature": llm.temperature,
+                    "response_format": {"type": "json_object"},
+                    "messages": [
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": step.prompt}
+                    ]
+                }
+            }))
 
-                Analyze this code in relation to the task.
-                """
-                analysis_step = self.execute_step(session, "analysis", analysis_prompt)
-                analysis = analysis_step.response
-            else:
-                # Skip analysis if not needed
-                analysis = "No analysis needed for this task."
+        try:
+            input_file = _openai_request(
+                self.api_key, "POST", "/files",
+                data={"purpose": "batch"},
+                files={"file": ("reasoning_batch.jsonl", "\n".join(lines).encode("utf-8"), "application/jsonl")}
+            ).json()
+            batch = _openai_request(self.api_key, "POST", "/batches", json={
+                "input_file_id": input_file["id"],
+                "endpoint": "/v1/chat/completions",
+                "completion_window": "24h"
+            }).json()
+        except Exception as e:
+            logger.exception(f"Error submitting reasoning batch: {str(e)}")
+            ReasoningStep.objects.filter(pk__in=[step.pk for step in steps]).update(error=str(e))
+            raise
 
-            # Step 3: Code Generation (if needed)
-            if needs_code_generation:
-                code_gen_prompt = f"""
-                Task: {task_description}
+        ReasoningSession.objects.filter(pk__in=[session.pk for session in sessions]).update(batch_id=batch["id"])
+        for session in sessions:
+            session.batch_id = batch["id"]
 
-                Plan: {plan}
+        logger.info(f"Submitted reasoning batch {batch['id']} with {len(lines)} requests")
+        return sessions
 
-                Analysis: {analysis}
+    @staticmethod
+    def collect_batch(batch_id: str, api_key: str) -> str:
+        """
+        Write the results of a finished batch into its reasoning steps.
 
-                Generate the necessary code to implement this task. Use the available tools to read, write, or execute files as needed.
-                """
-                code_gen_step = self.execute_step(session, "code_generation", code_gen_prompt)
-                code_implementation = code_gen_step.response
-            else:
-                # Skip code generation if not needed
-                code_implementation = "No code generation needed for this task."
+        Args:
+            batch_id: ID of the OpenAI batch
+            api_key: OpenAI API key the batch was submitted with
 
-            # Step 4: Testing/Execution (if needed)
-            if needs_testing:
-                testing_prompt = f"""
-                Task: {task_description}
+        Returns:
+            The status of the batch; steps are only updated once it is final
+        """
+        batch = _openai_request(api_key, "GET", f"/batches/{batch_id}").json()
+        status = batch["status"]
+        if status not in _BATCH_FINAL_STATUSES:
+            return status
+
+        pending_steps = {
+            f"{step.session_id}:{step.step_number}": step
+            for step in ReasoningStep.objects.filter(session__batch_id=batch_id, is_complete=False)
+        }
+
+        # Successful requests are in the output file, failed ones in the error file
+        results = []
+        for file_id in (batch.get("output_file_id"), batch.get("error_file_id")):
+            if file_id:
+                content = _openai_request(api_key, "GET", f"/files/{file_id}/content").text
+                results.extend(json.loads(line) for line in content.splitlines() if line.strip())
+
+        with transaction.atomic():
+            for result in results:
+                step = pending_steps.pop(result["custom_id"], None)
+                if step is None:
+                    continue
+                response = result.get("response") or {}
+                if result.get("error") or response.get("status_code") != 200:
+                    step.error = str(result.get("error") or response.get("body"))
+                    step.save(update_fields=["error", "updated_at"])
+                    continue
+                step.response = response["body"]["choices"][0]["message"]["content"]
+                step.summary = summarize_response(step.step_type, step.response)
+                step.is_complete = True
+                step.save(update_fields=_STEP_RESULT_FIELDS)
+
+            # Requests the batch never got to
+            for step in pending_steps.values():
+                step.error = f"Batch {batch_id} ended with status {status}"
+                step.save(update_fields=["error", "updated_at"])
+
+            ReasoningSession.objects.filter(batch_id=batch_id).update(is_complete=True, updated_at=timezone.now())
+
+        logger.info(f"Collected reasoning batch {batch_id} ({status}, {len(results)} results)")
+        return status
 
-                Plan: {plan}
+    def execute_reasoning_chain(self, task_description: str,
+                               context: Optional[Dict[str, Any]] = None) -> ReasoningSession:
+        """
+        Execute a full reasoning chain for a task.
 
-                Code implementation: {code_implementation}
+        Args:
+            task_description: Description of the task to perform
+            context: Optional context information (e.g., current file)
 
-                Test the implementation and verify it works correctly. Use the run_file tool if needed.
-                """
-                testing_step = self.execute_step(session, "testing", testing_prompt)
+        Returns:
+            Completed ReasoningSession instance
+        """
+        # Create a new session
+        session = self.create_session(
+            title=task_description[:100] + "..." if len(task_description) > 100 else task_description
+        )
 
-            # Step 5: Refinement (if needed)
-            if needs_refinement:
-                refinement_prompt = f"""
-                Task: {task_description}
+        try:
+            # Step 1: Planning (always executed)
+            planning_prompt = self._planning_prompt(task_description, context)
+            planning_step = self.execute_step(session, "planning", planning_prompt)
 
-                Plan: {plan}
+            # Check if the task is already completed in the planning step
+            # Look for indicators that the task was simple and already completed
+            task_already_completed = bool(_TASK_COMPLETED_RE.search(planning_step.response.lower()))
 
-                Code implementation: {code_implementation}
+            # Later prompts embed the condensed plan when the full one is long
+            plan = planning_step.summary or planning_step.response
 
-                Refine and optimize the implementation. Make any necessary improvements.
-                """
-                refinement_step = self.execute_step(session, "refinement", refinement_prompt)
+            # Determine which steps to execute based on the task description and planning response
+            task_lower = task_description.lower()
+            needs_analysis = (context and "current_file" in context and "current_file_content" in context and
+                             bool(_ANALYSIS_RE.search(task_lower)))
+
+            needs_code_generation = not task_already_completed and bool(_CODE_GENERATION_RE.search(task_lower))
+
+            needs_testing = not task_already_completed and bool(_TESTING_RE.search(task_lower))
+
+            needs_refinement = not task_already_completed and bool(_REFINEMENT_RE.search(task_lower))
+
+            # Steps 2 and 3: Analysis and Code Generation (if needed)
+            # Code generation builds on the analysis of the current file, so the
+            # analysis runs first; without one, code generation gets the file itself.
+            plan_context = self._add_sections(f"# TASK\n{task_description}", [("PLAN", plan)])
+            current_file_sections = []
+            if context and "current_file" in context and "current_file_content" in context:
+                file_content = context["current_file_content"]
+                if isinstance(file_content, str):
+                    # Trim the file so the prompts fit the smaller context window of the two
+                    # steps, instead of finding out from a failed request
+                    budget = (
+                        _CONTEXT_WINDOWS["gpt-4o"] - PROMPT_OUTPUT_RESERVE_TOKENS
+                        - max(count_tokens(get_prompt(step_type)) for step_type in ("analysis", "code_generation"))
+                        - count_tokens(plan_context)
+                        - 256  # the step instruction and the file's header
+                    )
+                    file_content = fit_to_token_budget(file_content, max(budget, 0))
+                current_file_sections.append(
+                    ("CURRENT FILE", f"{context['current_file']}\n```\n{file_content}\n```")
+                )
+            plan_file_context = self._add_sections(plan_context, current_file_sections)
+
+            # Reserve numbers for all remaining steps but the conclusion up front
+            remaining_steps = sum((bool(needs_analysis), needs_code_generation, needs_testing, needs_refinement))
+            next_step_number = self._next_step_number(session, remaining_steps) if remaining_steps else None
+
+            code_gen_context = plan_file_context
+            if needs_analysis:
+                analysis_prompt = self._step_prompt(plan_file_context, "analysis")
+                analysis_step = self.execute_step(session, "analysis", analysis_prompt, next_step_number)
+                next_step_number += 1
+                analysis = analysis_step.summary or analysis_step.response
+                code_gen_context = self._add_sections(plan_context, [("ANALYSIS", analysis)])
 
-            # Step 6: Conclusion (always executed)
-            conclusion_prompt = f"""
-            Task: {task_description}
+            if needs_code_generation:
+                code_gen_prompt = self._step_prompt(code_gen_context, "code_generation")
+                code_gen_step = self.execute_step(session, "code_generation", code_gen_prompt, next_step_number)
+                next_step_number += 1
+                code_implementation = code_gen_step.summary or code_gen_step.response
+            else:
+                # Skip code generation if not needed
+                code_implementation = "No code generation needed for this task."
 
-            Plan: {plan}
+            # Steps 4 and 5: Testing and Refinement (if needed)
+            # Their prompts are independent, but refinement rewrites the files that
+            # testing reads and runs, so refinement runs after testing.
+            implementation_context = self._add_sections(plan_context, [("CODE IMPLEMENTATION", code_implementation)])
 
-            {f"Implementation: {code_implementation}" if needs_code_generation else ""}
+            if needs_testing:
+                testing_prompt = self._step_prompt(implementation_context, "testing")
+                self.execute_step(session, "testing", testing_prompt, next_step_number)
+                next_step_number += 1
 
-            IMPORTANT: In this conclusion step, DO NOT execute any tools. Your job is ONLY to summarize what was accomplished in the previous steps.
+            if needs_refinement:
+                refinement_prompt = self._step_prompt(implementation_context, "refinement")
+                self.execute_step(session, "refinement", refinement_prompt, next_step_number)
+                next_step_number += 1
 
-            Provide a summary of what was accomplished and any next steps or recommendations.
-            """
+            # Step 6: Conclusion (always executed)
+            conclusion_prompt = self._step_prompt(
+                implementation_context if needs_code_generation else plan_context,
+                "conclusion"
+            )
             conclusion_step = self.execute_step(session, "conclusion", conclusion_prompt)
 
             # Mark session as complete
             session.is_complete = True
-            session.save()
+            session.save(update_fields=["is_complete", "updated_at"])
 
             return session
 
@@ -2,23 +2,78 @@
 Integration of chat and reasoning functionality.
 """
 
+import functools
 import json
 import logging
+import queue
+import re
+import threading
 from typing import Dict, Any, List
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
+from django.db import connection
+from django.db.models.functions import Substr
+from django.http import JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 
 from .models import Project, UserProfile, ChatMessage, ReasoningSession, ReasoningStep
-from .ai_reasoning import AIReasoning
 from .simple_reasoning import SimpleReasoning
 from .file_operations import FileOperations
 
+try:
+    # Optional: a local ONNX model that classifies complex tasks (see COMPLEX_TASK_CLASSIFIER)
+    import numpy as np
+    import onnxruntime
+    from tokenizers import Tokenizer
+except ImportError:
+    onnxruntime = None
+
 logger = logging.getLogger(__name__)
 
+# Tokens of a message passed to the complex-task classifier
+CLASSIFIER_MAX_TOKENS = 128
+
+# Keywords that suggest a multi-step task, compiled into one pattern scanned in a single pass
+_COMPLEX_TASK_RE = re.compile("|".join(re.escape(keyword) for keyword in [
+    "create and run",
+    "write and execute",
+    "implement and test",
+    "build a",
+    "develop a",
+    "make a",
+    "create a complete",
+    "step by step",
+    "sequence",
+    "workflow",
+    "pipeline",
+    "multiple steps",
+    "series of",
+    "chain of",
+    "first do",
+    "then do",
+    "after that",
+    "finally",
+    "multi-step",
+    "multi step"
+]))
+
+# Verbs that start an instruction
+_IMPERATIVE_VERBS = frozenset([
+    "create", "make", "build", "write", "implement", "add", "update",
+    "delete", "remove", "change", "modify", "run", "execute", "test",
+    "check", "verify", "generate", "install", "configure", "set up"
+])
+
+# Characters of each step response shown in the chat reply
+RESPONSE_PREVIEW_CHARS = 1000
+
+# The first whitespace-delimited word of each sentence
+_SENTENCE_START_RE = re.compile(r"(?:^|\.)\s*([^\s.]+)")
+
 
 @login_required
 @require_POST
@@ -50,6 +105,8 @@ def chat_with_reasoning(request, pk):
         current_file = data.get('current_file')
         current_file_content = data.get('current_file_content')
         use_reasoning = data.get('use_reasoning', False)
+        stream = data.get('stream', False)
+        background = data.get('background', False)
 
         if not message:
             return JsonResponse({
@@ -65,15 +122,15 @@ def chat_with_reasoning(request, pk):
             content=message
         )
 
-        # Get the last 10 messages for this project (excluding the one we just added)
+        # Get the 9 messages before the one we just added, newest first, loading only
+        # the fields that are used; ids grow with insertion order, so no exclude is needed
         recent_messages = ChatMessage.objects.filter(
-            project=project
-        ).exclude(
-            id=user_chat_message.id
-        ).order_by('-timestamp')[:9]
+            project_id=project.pk,
+            id__lt=user_chat_message.id
+        ).order_by('-id').only('id', 'role', 'content', 'timestamp')[:9]
 
         # Reverse the order to have oldest first
-        recent_messages = list(reversed(recent_messages))
+        recent_messages = list(recent_messages)[::-1]
 
         # Determine if we should use reasoning based on the message complexity
         # or if the user explicitly requested it
@@ -81,6 +138,23 @@ def chat_with_reasoning(request, pk):
 
         if should_use_reasoning:
             # Use the reasoning chain
+            if background:
+                # Nobody waits on the result, so plan it through the cheaper Batch API
+                return _queue_reasoning_request(
+                    request, project, user_profile, message,
+                    current_file, current_file_content,
+                    user_chat_message, recent_messages
+                )
+            if stream:
+                # Send each step as a server-sent event as soon as it completes
+                return StreamingHttpResponse(
+                    _stream_reasoning_request(
+                        request, project, user_profile, message,
+                        current_file, current_file_content,
+                        user_chat_message, recent_messages
+                    ),
+                    content_type='text/event-stream'
+                )
             return _handle_reasoning_request(
                 request, project, user_profile, message,
                 current_file, current_file_content,
@@ -108,66 +182,243 @@ def chat_with_reasoning(request, pk):
         }, status=500)
 
 
+@functools.lru_cache(maxsize=1)
+def _get_complex_task_classifier():
+    """
+    Load the complex-task classifier configured in settings, once per process.
+
+    COMPLEX_TASK_CLASSIFIER is a dict with the paths of an ONNX binary
+    sequence classifier ("model", outputting logits for simple/complex),
+    its tokenizer.json ("tokenizer"), and an optional "threshold" for the
+    complex probability (default 0.5).
+
+    Returns:
+        Tuple of (inference session, tokenizer, threshold), or None if no
+        classifier is configured or it cannot be loaded
+    """
+    config = getattr(settings, 'COMPLEX_TASK_CLASSIFIER', None)
+    if not config:
+        return None
+    if onnxruntime is None:
+        logger.warning("COMPLEX_TASK_CLASSIFIER is set but onnxruntime or tokenizers is not installed")
+        return None
+
+    try:
+        session = onnxruntime.InferenceSession(str(config['model']), providers=['CPUExecutionProvider'])
+        tokenizer = Tokenizer.from_file(str(config['tokenizer']))
+    except Exception as e:
+        logger.exception(f"Error loading complex task classifier: {str(e)}")
+        return None
+    return session, tokenizer, config.get('threshold', 0.5)
+
+
+def _classify_complex_task(classifier, message: str) -> bool:
+    """
+    Run the complex-task classifier on a message.
+
+    Args:
+        classifier: Tuple returned by _get_complex_task_classifier()
+        message: The user's message
+
+    Returns:
+        True if the predicted probability of a complex task reaches the threshold
+    """
+    session, tokenizer, threshold = classifier
+    encoding = tokenizer.encode(message)
+    inputs = {
+        'input_ids': np.array([encoding.ids[:CLASSIFIER_MAX_TOKENS]], dtype=np.int64),
+        'attention_mask': np.array([encoding.attention_mask[:CLASSIFIER_MAX_TOKENS]], dtype=np.int64),
+    }
+    input_names = {model_input.name for model_input in session.get_inputs()}
+    logits = session.run(None, {name: value for name, value in inputs.items() if name in input_names})[0][0]
+
+    # Softmax over (simple, complex)
+    scores = np.exp(logits - np.max(logits))
+    return bool(scores[1] / scores.sum() >= threshold)
+
+
 def _is_complex_task(message: str) -> bool:
     """
     Determine if a message represents a complex task that would benefit from reasoning.
 
+    Uses the classifier from COMPLEX_TASK_CLASSIFIER when one is configured,
+    and keyword heuristics otherwise.
+
     Args:
         message: The user's message
 
     Returns:
         True if the message is a complex task, False otherwise
     """
-    # Keywords that suggest a multi-step task
-    complex_keywords = [
-        "create and run",
-        "write and execute",
-        "implement and test",
-        "build a",
-        "develop a",
-        "make a",
-        "create a complete",
-        "step by step",
-        "sequence",
-        "workflow",
-        "pipeline",
-        "multiple steps",
-        "series of",
-        "chain of",
-        "first do",
-        "then do",
-        "after that",
-        "finally",
-        "multi-step",
-        "multi step"
-    ]
+    classifier = _get_complex_task_classifier()
+    if classifier is not None:
+        try:
+            return _classify_complex_task(classifier, message)
+        except Exception as e:
+            logger.exception(f"Error classifying task, using keyword heuristics: {str(e)}")
 
     # Check if any of the keywords are in the message
     message_lower = message.lower()
-    for keyword in complex_keywords:
-        if keyword in message_lower:
-            return True
+    if _COMPLEX_TASK_RE.search(message_lower):
+        return True
 
-    # Check if the message contains multiple instructions (sentences with imperative verbs)
-    sentences = [s.strip() for s in message.split('.') if s.strip()]
+    # Check if the message contains multiple instructions (sentences with imperative verbs),
+    # scanning sentence starts in place rather than splitting the message
     imperative_count = 0
-    imperative_verbs = ["create", "make", "build", "write", "implement", "add", "update",
-                        "delete", "remove", "change", "modify", "run", "execute", "test",
-                        "check", "verify", "generate", "install", "configure", "set up"]
-
-    for sentence in sentences:
-        words = sentence.lower().split()
-        if words and words[0] in imperative_verbs:
+    for match in _SENTENCE_START_RE.finditer(message_lower):
+        if match.group(1) in _IMPERATIVE_VERBS:
             imperative_count += 1
+            # If there are multiple imperative sentences, it's likely a complex task
+            if imperative_count >= 2:
+                return True
 
-    # If there are multiple imperative sentences, it's likely a complex task
-    return imperative_count >= 2
+    return False
 
 
-def _handle_reasoning_request(
+def _queue_reasoning_request(
+    request, project, user_profile, message,
+    current_file, current_file_content,
+    user_chat_message, recent_messages
+) -> JsonResponse:
+    """
+    Handle a background request by submitting its planning step as a batch.
+
+    The plan is written to the reasoning session once the batch has finished
+    (see the collect_reasoning_batches management command).
+
+    Args:
+        Same as _handle_reasoning_request
+
+    Returns:
+        JsonResponse with the queued reasoning session
+    """
+    context = {
+        'current_file': current_file,
+        'current_file_content': current_file_content
+    }
+
+    # Imported here so requests that never reach reasoning don't load LangChain
+    from .ai_reasoning import AIReasoning
+    reasoning = AIReasoning(project, user_profile.openai_api_key)
+    session = reasoning.execute_reasoning_chain_batch([message], context)[0]
+
+    response_content = "Your request has been queued for background planning. The plan will appear in the reasoning session once it is ready."
+
+    # Save the assistant's response to the database
+    ChatMessage.objects.create(
+        project=project,
+        user=request.user,
+        role='assistant',
+        content=response_content
+    )
+
+    return JsonResponse({
+        'status': 'success',
+        'message': response_content,
+        'reasoning_session_id': session.id,
+        'batch_id': session.batch_id,
+        'history': [
+            {
+                'id': msg.id,
+                'role': msg.role,
+                'content': msg.content,
+                'timestamp': msg.timestamp.isoformat()
+            } for msg in recent_messages + [user_chat_message]
+        ]
+    })
+
+
+async def _stream_reasoning_request(
     request, project, user_profile, message,
     current_file, current_file_content,
     user_chat_message, recent_messages
+):
+    """
+    Handle a request using the reasoning chain, producing server-sent events.
+
+    A "step" event is sent for every completed step while the chain runs, and a
+    final "result" event carries the same data as the non-streaming JSON response.
+
+    This is an async generator: under ASGI, Django collects a sync iterator of a
+    StreamingHttpResponse into a list before sending any of it, while an async
+    one is sent event by event.
+
+    Args:
+        Same as _handle_reasoning_request
+
+    Yields:
+        Server-sent event strings
+    """
+    events = queue.Queue()
+
+    def on_step(session, step, status, error=None):
+        if status == 'completed':
+            events.put(('step', {
+                'session_id': session.id,
+                'step_number': step.step_number,
+                'step_type': step.step_type,
+                'response': step.response
+            }))
+
+    def run():
+        try:
+            response = _handle_reasoning_request(
+                request, project, user_profile, message,
+                current_file, current_file_content,
+                user_chat_message, recent_messages,
+                step_listener=on_step
+            )
+            events.put(('result', json.loads(response.content)))
+        except Exception as e:
+            logger.exception(f"Error in streamed reasoning request: {str(e)}")
+            events.put(('result', {'status': 'error', 'message': str(e)}))
+        finally:
+            # The chain runs on its own thread, which has its own database connection
+            connection.close()
+
+    threading.Thread(target=run, daemon=True).start()
+
+    # Wait for events on a worker thread of its own rather than the thread
+    # shared by the sync views
+    get_event = sync_to_async(events.get, thread_sensitive=False)
+    while True:
+        event, data = await get_event()
+        yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        if event == 'result':
+            break
+
+
+def _fall_back_to_chat(
+    request, project, user_profile, message,
+    current_file, current_file_content,
+    user_chat_message, recent_messages,
+    pending_messages
+) -> JsonResponse:
+    """
+    Save the pending system messages and answer with regular chat instead.
+
+    Args:
+        Same as _handle_reasoning_request, plus
+        pending_messages: Unsaved ChatMessage instances explaining the fallback
+
+    Returns:
+        JsonResponse from the regular chat
+    """
+    ChatMessage.objects.bulk_create(pending_messages)
+
+    from .views import chat_with_openai_internal
+    return chat_with_openai_internal(
+        request, project, user_profile, message,
+        current_file, current_file_content,
+        user_chat_message, recent_messages
+    )
+
+
+def _handle_reasoning_request(
+    request, project, user_profile, message,
+    current_file, current_file_content,
+    user_chat_message, recent_messages,
+    step_listener=None
 ) -> JsonResponse:
     """
     Handle a request using the reasoning chain.
@@ -181,6 +432,7 @@ def _handle_reasoning_request(
         current_file_content: The content of the current file (if any)
         user_chat_message: The saved user message
         recent_messages: Recent chat messages
+        step_listener: Optional callable(session, step, status, error) told about step progress
 
     Returns:
         JsonResponse with the reasoning results
@@ -191,24 +443,29 @@ def _handle_reasoning_request(
         'current_file_content': current_file_content
     }
 
+    # Chat messages to save, written together in one query on the way out
+    pending_messages = []
+
     try:
         # Initialize the AI reasoning system with a try/except block
         try:
             # First try with the LangChain-based reasoning
             try:
-                # Try to initialize the AI reasoning system
+                # Try to initialize the AI reasoning system. It is imported here so
+                # requests that never reach reasoning don't load LangChain.
+                from .ai_reasoning import AIReasoning
                 reasoning = AIReasoning(project, user_profile.openai_api_key)
             except Exception as e:
                 # If there's any error with the LangChain-based reasoning, fall back to simple reasoning
                 logger.warning(f"Falling back to simple reasoning due to error: {str(e)}")
 
                 # Log a message to the user
-                ChatMessage.objects.create(
+                pending_messages.append(ChatMessage(
                     project=project,
                     user=request.user,
                     role='system',
                     content="Using simplified reasoning system due to compatibility issues with the advanced system."
-                )
+                ))
 
                 # Use the simple reasoning implementation instead
                 reasoning = SimpleReasoning(project, user_profile.openai_api_key)
@@ -218,28 +475,34 @@ def _handle_reasoning_request(
             error_message = f"The reasoning system encountered an initialization error: {str(e)}. Falling back to regular chat."
 
             # Save the error message as a system message
-            ChatMessage.objects.create(
+            pending_messages.append(ChatMessage(
                 project=project,
                 user=request.user,
                 role='system',
                 content=error_message
-            )
+            ))
 
             # Fall back to regular chat
-            from .views import chat_with_openai_internal
-            return chat_with_openai_internal(
+            return _fall_back_to_chat(
                 request, project, user_profile, message,
                 current_file, current_file_content,
-                user_chat_message, recent_messages
+                user_chat_message, recent_messages,
+                pending_messages
             )
 
         # Execute the reasoning chain
+        reasoning.step_listener = step_listener
         session = reasoning.execute_reasoning_chain(message, context)
 
-        # Get all steps
-        steps = session.steps.all().order_by('step_number')
+        # Get all steps in order, with a single query reused below. Only the start of
+        # each response is shown, so the database cuts it off rather than sending it all.
+        ordered_steps = list(
+            session.steps.order_by('step_number')
+            .only('step_number', 'step_type', 'is_complete', 'tool_calls')
+            .annotate(response_preview=Substr('response', 1, RESPONSE_PREVIEW_CHARS + 1))
+        )
 
-        if not steps.exists():
+        if not ordered_steps:
             # If no steps were created, there was likely an error
             error_message = "The reasoning system encountered an error. Falling back to regular chat."
             logger.error(f"No reasoning steps created for session {session.id}")
@@ -248,38 +511,35 @@ def _handle_reasoning_request(
             session.delete()
 
             # Fall back to regular chat
-            from .views import chat_with_openai_internal
-            return chat_with_openai_internal(
+            return _fall_back_to_chat(
                 request, project, user_profile, message,
                 current_file, current_file_content,
-                user_chat_message, recent_messages
+                user_chat_message, recent_messages,
+                pending_messages
             )
     except Exception as e:
         logger.exception(f"Error in reasoning system: {str(e)}")
         error_message = f"The reasoning system encountered an error: {str(e)}. Falling back to regular chat."
 
         # Save the error message as a system message
-        ChatMessage.objects.create(
+        pending_messages.append(ChatMessage(
             project=project,
             user=request.user,
             role='system',
             content=error_message
-        )
+        ))
 
         # Fall back to regular chat
-        from .views import chat_with_openai_internal
-        return chat_with_openai_internal(
+        return _fall_back_to_chat(
             request, project, user_profile, message,
             current_file, current_file_content,
-            user_chat_message, recent_messages
+            user_chat_message, recent_messages,
+            pending_messages
         )
 
     # Format the response for the chat
     response_content = f"I've analyzed your request and broken it down into steps:\n\n"
 
-    # Get all steps in order
-    ordered_steps = list(steps.order_by('step_number'))
-
     # Add each step to the response
     for i, step in enumerate(ordered_steps):
         if not step.is_complete:
@@ -290,9 +550,9 @@ def _handle_reasoning_request(
         response_content += f"**Step {i+1}: {step_type_display}**\n"
 
         # Add step response (truncated if too long)
-        step_response = step.response
-        if len(step_response) > 1000:
-            step_response = step_response[:1000] + "...\n[Response truncated for readability]"
+        step_response = step.response_preview
+        if len(step_response) > RESPONSE_PREVIEW_CHARS:
+            step_response = step_response[:RESPONSE_PREVIEW_CHARS] + "...\n[Response truncated for readability]"
 
         response_content += f"{step_response}\n\n"
 
@@ -300,17 +560,18 @@ def _handle_reasoning_request(
     if not any(step.is_complete for step in ordered_steps):
         response_content += "I'm still working on analyzing your request. Please check back in a moment.\n\n"
 
-    # Save the assistant's response to the database
-    ChatMessage.objects.create(
+    # Save the assistant's response to the database, with any system messages from above
+    pending_messages.append(ChatMessage(
         project=project,
         user=request.user,
         role='assistant',
         content=response_content
-    )
+    ))
+    ChatMessage.objects.bulk_create(pending_messages)
 
     # Get any tool results from the reasoning steps
     tool_results = []
-    for step in steps:
+    for step in ordered_steps:
         if step.tool_calls:
             for tool_call in step.tool_calls:
                 tool_results.append({
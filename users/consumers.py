@@ -1,12 +1,31 @@
+import asyncio
 import json
 import logging
 from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async
 from django.contrib.auth.models import AnonymousUser
 from .models import Project
 
+try:
+    # orjson is an optional, faster drop-in for encoding the events
+    import orjson
+
+    def _encode_event(event) -> bytes:
+        return orjson.dumps(event)
+except ImportError:
+    def _encode_event(event) -> bytes:
+        return json.dumps(event).encode('utf-8')
+
 logger = logging.getLogger(__name__)
 
+# Seconds reasoning step events are held so a burst of them goes out as one frame
+STEP_BATCH_WINDOW = 0.005
+
+# Channel names of the tool consumers connected to this process, by project ID.
+# With TOOL_EVENTS_SINGLE_PROCESS, senders use it to skip the group fan-out.
+# Senders read it from worker threads, so each entry is a frozenset that
+# connect and disconnect replace rather than change in place.
+PROJECT_CHANNELS = {}
+
 class ToolConsumer(AsyncWebsocketConsumer):
     """
     WebSocket consumer for tool execution notifications.
@@ -33,6 +52,10 @@ class ToolConsumer(AsyncWebsocketConsumer):
             await self.close()
             return
 
+        # Reasoning step events waiting to be sent as one batch
+        self._pending_steps = []
+        self._flush_task = None
+
         # Set the group name
         self.group_name = f"tools_{self.project_id}"
 
@@ -41,6 +64,8 @@ class ToolConsumer(AsyncWebsocketConsumer):
             self.group_name,
             self.channel_name
         )
+        project_id = int(self.project_id)
+        PROJECT_CHANNELS[project_id] = PROJECT_CHANNELS.get(project_id, frozenset()) | {self.channel_name}
 
         # Accept the connection
         await self.accept()
@@ -50,7 +75,17 @@ class ToolConsumer(AsyncWebsocketConsumer):
         """
         Called when the WebSocket closes.
         """
+        # Drop any step events still waiting for their batch
+        if getattr(self, '_flush_task', None):
+            self._flush_task.cancel()
+
         # Leave the group
+        project_id = int(self.project_id)
+        channels = PROJECT_CHANNELS.get(project_id, frozenset()) - {self.channel_name}
+        if channels:
+            PROJECT_CHANNELS[project_id] = channels
+        else:
+            PROJECT_CHANNELS.pop(project_id, None)
         await self.channel_layer.group_discard(
             self.group_name,
             self.channel_name
@@ -64,35 +99,93 @@ class ToolConsumer(AsyncWebsocketConsumer):
         # We don't expect to receive messages from the client
         pass
 
+    async def _flush_steps(self):
+        """
+        Send the pending reasoning step events as one reasoning_step_batch frame.
+        """
+        if self._flush_task and self._flush_task is not asyncio.current_task():
+            self._flush_task.cancel()
+        self._flush_task = None
+
+        if not self._pending_steps:
+            return
+        steps, self._pending_steps = self._pending_steps, []
+        await self.send(bytes_data=_encode_event({
+            'type': 'reasoning_step_batch',
+            'steps': steps
+        }))
+
+    async def _flush_steps_later(self):
+        """
+        Send the pending reasoning step events once the batch window has passed.
+        """
+        await asyncio.sleep(STEP_BATCH_WINDOW)
+        await self._flush_steps()
+
     async def tool_executed(self, event):
         """
         Called when a tool is executed.
         """
+        # Keep the order of events: pending step events go first
+        await self._flush_steps()
+
         # Send the notification to the client
-        await self.send(text_data=json.dumps({
+        await self.send(bytes_data=_encode_event({
             'type': 'tool_executed',
             'tool_name': event['tool_name'],
             'result': event['result']
         }))
 
+    async def tool_output(self, event):
+        """
+        Called when a running tool produces a line of output.
+        """
+        # Keep the order of events: pending step events go first
+        await self._flush_steps()
+
+        # Send the output to the client
+        await self.send(bytes_data=_encode_event({
+            'type': 'tool_output',
+            'tool_name': event['tool_name'],
+            'stream': event['stream'],
+            'chunk': event['chunk']
+        }))
+
     async def reasoning_step(self, event):
         """
         Called when a reasoning step is started, completed, or failed.
+
+        Events arriving within STEP_BATCH_WINDOW of each other are coalesced
+        into a single reasoning_step_batch frame.
         """
-        # Send the notification to the client
-        await self.send(text_data=json.dumps({
-            'type': 'reasoning_step',
+        self._pending_steps.append({
             'session_id': event['session_id'],
             'step': event['step']
+        })
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_steps_later())
+
+    async def reasoning_step_delta(self, event):
+        """
+        Called when a running reasoning step produces more output.
+        """
+        # Keep the order of events: the step must be known before its output
+        await self._flush_steps()
+
+        # Send the partial response to the client
+        await self.send(bytes_data=_encode_event({
+            'type': 'reasoning_step_delta',
+            'session_id': event['session_id'],
+            'step_id': event['step_id'],
+            'delta': event['delta']
         }))
 
-    @database_sync_to_async
-    def user_has_project_access(self, project_id):
+    async def user_has_project_access(self, project_id):
         """
         Check if the user has access to the project.
         """
         try:
-            return Project.objects.filter(id=project_id, user=self.user).exists()
+            return await Project.objects.filter(id=project_id, user=self.user).aexists()
         except Exception as e:
             logger.exception(f"Error checking project access: {str(e)}")
             return False
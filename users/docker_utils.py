@@ -1,31 +1,69 @@
+import collections
 import docker
 import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from django.utils import timezone
+from .models import Project
 
 logger = logging.getLogger(__name__)
 
+# Seconds a successful ping of the Docker daemon is trusted before pinging again
+PING_TTL = 5.0
+
+# Seconds an image found or pulled is assumed to still be present locally
+IMAGE_TTL = 300.0
+
+# Exit codes of a command run by exec_command that coreutils timeout stopped:
+# 124 when it ended on SIGTERM, 137 when it had to be killed with SIGKILL
+_EXEC_TIMEOUT_EXIT_CODES = frozenset({124, 137})
+
 class DockerManager:
     """Utility class to manage Docker containers for projects."""
 
     def __init__(self):
         """Initialize the Docker client."""
         try:
-            self.client = docker.from_env()
+            # A larger connection pool lets concurrent requests reuse keep-alive connections
+            self.client = docker.from_env(max_pool_size=32)
             logger.info("Docker client initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize Docker client: {str(e)}")
             self.client = None
 
+        # When the daemon last answered a ping (time.monotonic())
+        self._last_ping_ts = None
+
+        # Container handles by container ID, so actions on a known container
+        # don't need a lookup request first
+        self._container_cache = {}
+
+        # When each image was last seen present locally (time.monotonic())
+        self._known_images = {}
+
+    def _get_container(self, container_id):
+        """Get a handle for a container, looking it up only the first time."""
+        container = self._container_cache.get(container_id)
+        if container is None:
+            container = self.client.containers.get(container_id)
+            self._container_cache[container_id] = container
+        return container
+
     def is_available(self):
-        """Check if Docker is available."""
+        """Check if Docker is available, pinging the daemon at most once per PING_TTL seconds."""
         if not self.client:
             return False
+        if self._last_ping_ts is not None and time.monotonic() - self._last_ping_ts < PING_TTL:
+            return True
         try:
             self.client.ping()
+            self._last_ping_ts = time.monotonic()
             return True
         except Exception:
+            self._last_ping_ts = None
             return False
 
     def calculate_project_port(self, project_id):
@@ -43,8 +81,43 @@ class DockerManager:
 
         return web_server_port
 
-    def create_container(self, project):
-        """Create a Docker container for the project."""
+    def _ensure_image(self, image):
+        """
+        Check if an image exists locally, pulling it if not. Returns whether it is available.
+
+        An image seen within the last IMAGE_TTL seconds is not checked again.
+        """
+        seen_at = self._known_images.get(image)
+        if seen_at is not None and time.monotonic() - seen_at < IMAGE_TTL:
+            return True
+
+        try:
+            self.client.images.get(image)
+            logger.info(f"Image {image} found locally")
+        except docker.errors.ImageNotFound:
+            logger.info(f"Image {image} not found locally, pulling...")
+            try:
+                self.client.images.pull(image)
+                logger.info(f"Image {image} pulled successfully")
+            except Exception as pull_error:
+                logger.error(f"Failed to pull image {image}: {str(pull_error)}")
+                return False
+
+        self._known_images[image] = time.monotonic()
+        return True
+
+    def create_container(self, project, ensure_image=True, save=True):
+        """
+        Create a Docker container for the project.
+
+        Args:
+            project: The project
+            ensure_image: Whether to check for the image (and pull it) first
+            save: Whether to save the container fields of the project
+
+        Returns:
+            True if the container was created
+        """
         if not self.is_available():
             logger.error("Docker is not available")
             return False
@@ -54,17 +127,8 @@ class DockerManager:
             data_dir = project.get_data_directory()
 
             # Check if the image exists, if not, try to pull it
-            try:
-                self.client.images.get(project.container_image)
-                logger.info(f"Image {project.container_image} found locally")
-            except docker.errors.ImageNotFound:
-                logger.info(f"Image {project.container_image} not found locally, pulling...")
-                try:
-                    self.client.images.pull(project.container_image)
-                    logger.info(f"Image {project.container_image} pulled successfully")
-                except Exception as pull_error:
-                    logger.error(f"Failed to pull image {project.container_image}: {str(pull_error)}")
-                    return False
+            if ensure_image and not self._ensure_image(project.container_image):
+                return False
 
             # Create a container with the project's data directory mounted
             container_name = f"project_{project.id}_{project.title.lower().replace(' ', '_')}"
@@ -74,6 +138,7 @@ class DockerManager:
                 existing_container = self.client.containers.get(container_name)
                 logger.warning(f"Container with name {container_name} already exists, removing it")
                 existing_container.remove(force=True)
+                self._container_cache.pop(existing_container.id, None)
             except docker.errors.NotFound:
                 # Container doesn't exist, which is what we want
                 pass
@@ -111,14 +176,23 @@ class DockerManager:
             )
 
             # Update the project with container information
+            self._container_cache[container.id] = container
             project.container_id = container.id
             project.container_status = "created"
             project.container_created_at = timezone.now()
-            project.save()
+            if save:
+                project.save(update_fields=['container_id', 'container_status', 'container_created_at',
+                                            'web_server_port', 'updated_at'])
 
             logger.info(f"Container created for project {project.id}: {container.id}")
             return True
 
+        except docker.errors.ImageNotFound as image_error:
+            # The image was removed since it was last seen; check again next time
+            self._known_images.pop(project.container_image, None)
+            logger.error(f"Image not found for project {project.id}: {str(image_error)}")
+            return False
+
         except docker.errors.APIError as api_error:
             logger.error(f"Docker API error for project {project.id}: {str(api_error)}")
             return False
@@ -126,27 +200,68 @@ class DockerManager:
             logger.error(f"Failed to create container for project {project.id}: {str(e)}")
             return False
 
+    def create_containers_bulk(self, projects, max_workers=8):
+        """
+        Create Docker containers for several projects at once.
+
+        Each image is checked (and pulled) once rather than once per project,
+        the containers are created concurrently, and the projects are saved
+        with a single bulk update.
+
+        Args:
+            projects: The projects
+            max_workers: Maximum number of containers created at the same time
+
+        Returns:
+            Dict mapping project IDs to whether their container was created
+        """
+        if not self.is_available():
+            logger.error("Docker is not available")
+            return {project.id: False for project in projects}
+
+        images = {image: self._ensure_image(image) for image in {project.container_image for project in projects}}
+
+        def create(project):
+            if not images[project.container_image]:
+                return False
+            return self.create_container(project, ensure_image=False, save=False)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = dict(zip((project.id for project in projects), executor.map(create, projects)))
+
+        created = [project for project in projects if results[project.id]]
+        now = timezone.now()
+        for project in created:
+            project.updated_at = now
+        Project.objects.bulk_update(created, ['container_id', 'container_status', 'container_created_at',
+                                              'web_server_port', 'updated_at'])
+
+        return results
+
     def start_container(self, project):
         """Start the Docker container for the project."""
         if not self.is_available() or not project.container_id:
             return False
 
         try:
-            container = self.client.containers.get(project.container_id)
+            container = self._get_container(project.container_id)
             container.start()
 
             # Update the project's container status
             project.container_status = "running"
-            project.save()
+            project.save(update_fields=['container_status', 'updated_at'])
 
             logger.info(f"Container started for project {project.id}: {project.container_id}")
             return True
 
         except docker.errors.NotFound:
             logger.error(f"Container not found for project {project.id}: {project.container_id}")
+            self._container_cache.pop(project.container_id, None)
             project.container_id = None
             project.container_status = None
-            project.save()
+            Project.objects.filter(pk=project.pk).update(
+                container_id=None, container_status=None, updated_at=timezone.now()
+            )
             return False
 
         except Exception as e:
@@ -159,21 +274,24 @@ class DockerManager:
             return False
 
         try:
-            container = self.client.containers.get(project.container_id)
+            container = self._get_container(project.container_id)
             container.stop()
 
             # Update the project's container status
             project.container_status = "stopped"
-            project.save()
+            project.save(update_fields=['container_status', 'updated_at'])
 
             logger.info(f"Container stopped for project {project.id}: {project.container_id}")
             return True
 
         except docker.errors.NotFound:
             logger.error(f"Container not found for project {project.id}: {project.container_id}")
+            self._container_cache.pop(project.container_id, None)
             project.container_id = None
             project.container_status = None
-            project.save()
+            Project.objects.filter(pk=project.pk).update(
+                container_id=None, container_status=None, updated_at=timezone.now()
+            )
             return False
 
         except Exception as e:
@@ -186,61 +304,148 @@ class DockerManager:
             return False
 
         try:
-            container = self.client.containers.get(project.container_id)
-
-            # Stop the container if it's running
-            if container.status == "running":
-                container.stop()
+            container = self._get_container(project.container_id)
 
-            # Remove the container
-            container.remove()
+            # Remove the container, stopping it first if it's running. The kill
+            # that force implies costs no request for the current status, and the
+            # container's command ignores the SIGTERM a stop would send anyway.
+            container.remove(force=True)
+            self._container_cache.pop(project.container_id, None)
 
             # Update the project
             project.container_id = None
             project.container_status = None
             project.container_created_at = None
-            project.save()
+            project.save(update_fields=['container_id', 'container_status', 'container_created_at', 'updated_at'])
 
             logger.info(f"Container removed for project {project.id}")
             return True
 
         except docker.errors.NotFound:
             logger.error(f"Container not found for project {project.id}: {project.container_id}")
+            self._container_cache.pop(project.container_id, None)
             project.container_id = None
             project.container_status = None
-            project.save()
+            Project.objects.filter(pk=project.pk).update(
+                container_id=None, container_status=None, updated_at=timezone.now()
+            )
             return True  # Return True since the container is already gone
 
         except Exception as e:
             logger.error(f"Failed to remove container for project {project.id}: {str(e)}")
             return False
 
+    def exec_command(self, project, command, timeout, max_output_bytes=None, on_output=None):
+        """
+        Run a shell command in the project's running container.
+
+        The command goes through the Docker API on the client's pooled
+        connections, so no docker CLI process is started for it. Output is
+        read as it arrives, keeping at most max_output_bytes of each stream.
+
+        Args:
+            project: Project whose container runs the command
+            command: Shell command, run with bash -c
+            timeout: Seconds after which the command is stopped
+            max_output_bytes: Trailing bytes of each stream to keep (None keeps all)
+            on_output: Optional callable invoked as on_output(stream, chunk) with
+                every chunk of raw output as it arrives, where stream is
+                "stdout" or "stderr"
+
+        Returns:
+            Tuple of (stdout, stderr, exit_code, timed_out), with the output
+            decoded as UTF-8. timed_out is True if the command was stopped at
+            its timeout.
+        """
+        api = self.client.api
+
+        # The exec API has no timeout of its own, so coreutils timeout stops
+        # the command inside the container
+        exec_id = api.exec_create(
+            project.container_id,
+            ['timeout', '--kill-after=5', str(timeout), 'bash', '-c', command]
+        )['Id']
+
+        # Chunks of each stream and their total size; the oldest chunks are
+        # dropped once the stream holds more than max_output_bytes
+        chunks = (collections.deque(), collections.deque())
+        sizes = [0, 0]
+        started = time.monotonic()
+        for frames in api.exec_start(exec_id, stream=True, demux=True):
+            for i, chunk in enumerate(frames):
+                if not chunk:
+                    continue
+                if on_output is not None:
+                    on_output(("stdout", "stderr")[i], chunk)
+                chunks[i].append(chunk)
+                sizes[i] += len(chunk)
+                while max_output_bytes is not None and sizes[i] - len(chunks[i][0]) >= max_output_bytes:
+                    sizes[i] -= len(chunks[i].popleft())
+
+        exit_code = api.exec_inspect(exec_id)['ExitCode']
+        # The exit codes of timeout can also come from the command itself, so
+        # they only count as a timeout once the timeout has actually passed
+        timed_out = exit_code in _EXEC_TIMEOUT_EXIT_CODES and time.monotonic() - started >= timeout
+
+        stdout, stderr = (b''.join(stream) for stream in chunks)
+        if max_output_bytes is not None:
+            stdout, stderr = stdout[-max_output_bytes:], stderr[-max_output_bytes:]
+        return (
+            stdout.decode('utf-8', 'replace'),
+            stderr.decode('utf-8', 'replace'),
+            exit_code,
+            timed_out
+        )
+
     def get_container_status(self, project):
         """Get the current status of the project's container."""
         if not self.is_available() or not project.container_id:
             return None
 
         try:
-            container = self.client.containers.get(project.container_id)
+            container = self._container_cache.get(project.container_id)
+            if container is None:
+                container = self._get_container(project.container_id)
+            else:
+                # Refresh the cached handle's attributes to get the current status
+                container.reload()
             status = container.status
 
-            # Update the project's container status if it's different
+            # Update the project's container status if it's different, with a single
+            # UPDATE of those columns rather than a save of the whole row
             if project.container_status != status:
                 project.container_status = status
-                project.save()
+                Project.objects.filter(pk=project.pk).update(
+                    container_status=status, updated_at=timezone.now()
+                )
 
             return status
 
         except docker.errors.NotFound:
             logger.error(f"Container not found for project {project.id}: {project.container_id}")
+            self._container_cache.pop(project.container_id, None)
             project.container_id = None
             project.container_status = None
-            project.save()
+            Project.objects.filter(pk=project.pk).update(
+                container_id=None, container_status=None, updated_at=timezone.now()
+            )
             return None
 
         except Exception as e:
             logger.error(f"Failed to get container status for project {project.id}: {str(e)}")
             return None
 
-# Create a singleton instance
-docker_manager = DockerManager()
+# The process-wide instance, created on first use: connecting the Docker client
+# asks the daemon for its API version, which shouldn't happen at import time
+_docker_manager = None
+_docker_manager_lock = threading.Lock()
+
+
+def get_docker_manager():
+    """Get the DockerManager shared by the whole process."""
+    global _docker_manager
+    if _docker_manager is None:
+        with _docker_manager_lock:
+            if _docker_manager is None:
+                _docker_manager = DockerManager()
+    return _docker_manager
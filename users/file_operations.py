@@ -2,18 +2,109 @@
 File operations tools for the Model Context Protocol.
 """
 
+import codecs
+import mmap
 import os
 import shutil
+import stat
 import logging
 import subprocess
 import tempfile
 import difflib
 import re
+import collections
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
 from .mcp import MCP, tool
-from .docker_utils import docker_manager
+from .docker_utils import get_docker_manager
 
 logger = logging.getLogger(__name__)
 
+# Seconds a file may run in the container before it is stopped
+RUN_TIMEOUT = 30
+
+# Trailing lines of each output stream kept by run_file_stream
+RUN_OUTPUT_MAX_LINES = 200
+
+# Trailing bytes of each output stream kept by run_file
+RUN_OUTPUT_MAX_BYTES = 1024 * 1024
+
+# Bytes of a file returned by one read_file call; longer files are read in parts
+READ_FILE_MAX_BYTES = 1024 * 1024
+
+# Resolve symlinks when checking that a path is inside the project directory.
+# Code running in the container can create symlinks there, so only turn this
+# off if nothing else writes to the project directories.
+RESOLVE_SYMLINKS = getattr(settings, 'FILE_TOOLS_RESOLVE_SYMLINKS', True)
+
+# Delete directories with coreutils rm instead of shutil.rmtree, which unlinks
+# every entry from a Python loop
+USE_FAST_RMTREE = getattr(settings, 'USE_FAST_RMTREE', False)
+
+# Shell command that runs a file in the container, by file extension. Each is
+# called with the file's container path, its name, its directory and its name
+# without the extension.
+_RUNNERS = {
+    '.py': lambda path, name, directory, stem: f"python {path}",
+    '.js': lambda path, name, directory, stem: f"node {path}",
+    '.sh': lambda path, name, directory, stem: f"bash {path}",
+    '.php': lambda path, name, directory, stem: f"php {path}",
+    '.rb': lambda path, name, directory, stem: f"ruby {path}",
+    '.pl': lambda path, name, directory, stem: f"perl {path}",
+    # Compiled languages are built next to the source first
+    '.java': lambda path, name, directory, stem: f"cd {directory} && javac {name} && java {stem}",
+    '.c': lambda path, name, directory, stem: f"cd {directory} && gcc {name} -o {stem} && ./{stem}",
+    '.cpp': lambda path, name, directory, stem: f"cd {directory} && g++ {name} -o {stem} && ./{stem}",
+}
+
+# Files read at the same time by read_files
+READ_FILES_MAX_WORKERS = 8
+
+# Bytes handed to each write() call when writing a file
+WRITE_CHUNK_SIZE = 1024 * 1024
+
+# Keeps Windows from translating newlines in files opened with os.open
+_O_BINARY = getattr(os, 'O_BINARY', 0)
+
+# Chunks passed to one writev() call (the POSIX minimum of IOV_MAX is 16)
+WRITEV_MAX_CHUNKS = 16
+
+
+def _stat_or_none(path):
+    """
+    Stat a path, telling in one call whether it exists and what it is.
+
+    :param path: Absolute path
+    :return: The os.stat_result, or None if the path does not exist
+    """
+    try:
+        return os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+
+
+def _write_all(fd, data):
+    """
+    Write all of data to a file descriptor.
+
+    Data that fits in one WRITE_CHUNK_SIZE chunk is written with a single
+    write(); larger data is split into chunks handed to the kernel together
+    with writev() where the platform has it.
+
+    :param fd: File descriptor open for writing
+    :param data: Bytes to write
+    """
+    view = memoryview(data)
+    offset = 0
+    while offset < len(view):
+        if len(view) - offset > WRITE_CHUNK_SIZE and hasattr(os, 'writev'):
+            chunks = [view[start:start + WRITE_CHUNK_SIZE]
+                      for start in range(offset, len(view), WRITE_CHUNK_SIZE)]
+            offset += os.writev(fd, chunks[:WRITEV_MAX_CHUNKS])
+        else:
+            offset += os.write(fd, view[offset:offset + WRITE_CHUNK_SIZE])
+
+
 class FileOperations(MCP):
     """File operations tools for the Model Context Protocol."""
 
@@ -22,8 +113,36 @@ class FileOperations(MCP):
         self.project = project
         self.user = user
         self.data_dir = project.get_data_directory()
+        # Resolved project directory, and the prefix of every path inside it
+        self._data_dir_real = os.path.realpath(self.data_dir)
+        self._data_dir_prefix = self._data_dir_real + os.sep
         super().__init__()
 
+    def _safe_path(self, relative_path):
+        """
+        Build the absolute path of a file in the project, refusing paths outside it.
+
+        '..' segments and, unless FILE_TOOLS_RESOLVE_SYMLINKS is off, symlinks
+        are resolved for the check, so neither can lead out of the project
+        directory. The path returned is not resolved, so a symlink in the
+        project is acted on as the link itself (e.g. deleting it removes the
+        link, not its target).
+
+        :param relative_path: Path relative to the project root
+        :return: The normalized absolute path, or None if it is outside the project directory
+        """
+        # '..' segments are collapsed lexically first, which costs no system
+        # calls and rejects traversal attempts straight away
+        full_path = os.path.normpath(os.path.join(self._data_dir_real, relative_path))
+        if full_path != self._data_dir_real and not full_path.startswith(self._data_dir_prefix):
+            return None
+
+        if RESOLVE_SYMLINKS:
+            real_path = os.path.realpath(full_path)
+            if real_path != self._data_dir_real and not real_path.startswith(self._data_dir_prefix):
+                return None
+        return full_path
+
     @tool(name="create_file", description="Create a new file in the project")
     def create_file(self, file_path, content=""):
         """
@@ -40,26 +159,31 @@ class FileOperations(MCP):
             normalized_path = file_path.lstrip('/')
 
             # Security check: make sure the file is within the project directory
-            full_path = os.path.join(self.data_dir, normalized_path)
-            if os.path.commonpath([full_path, self.data_dir]) != self.data_dir:
+            full_path = self._safe_path(normalized_path)
+            if full_path is None:
                 return {
                     "status": "error",
                     "message": "Invalid file path. The file must be within the project directory."
                 }
 
-            # Check if the file already exists
-            if os.path.exists(full_path):
+            # Create directory if it doesn't exist
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+
+            # Exclusive create fails if the file already exists, so no separate
+            # check is needed and a file created meanwhile is never overwritten
+            try:
+                fd = os.open(full_path, _O_BINARY | os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+            except FileExistsError:
                 return {
                     "status": "error",
                     "message": f"File {normalized_path} already exists."
                 }
 
-            # Create directory if it doesn't exist
-            os.makedirs(os.path.dirname(full_path), exist_ok=True)
-
-            # Write the file
-            with open(full_path, 'w') as f:
-                f.write(content)
+            # Write the file, encoded once up front and written straight to the descriptor
+            try:
+                _write_all(fd, content.encode('utf-8'))
+            finally:
+                os.close(fd)
 
             return {
                 "status": "success",
@@ -90,30 +214,34 @@ class FileOperations(MCP):
             normalized_path = file_path.lstrip('/')
 
             # Security check: make sure the file is within the project directory
-            full_path = os.path.join(self.data_dir, normalized_path)
-            if os.path.commonpath([full_path, self.data_dir]) != self.data_dir:
+            full_path = self._safe_path(normalized_path)
+            if full_path is None:
                 return {
                     "status": "error",
                     "message": "Invalid file path. The file must be within the project directory."
                 }
 
             # Check if the file exists
-            if not os.path.exists(full_path):
+            st = _stat_or_none(full_path)
+            if st is None:
                 return {
                     "status": "error",
                     "message": f"File {normalized_path} does not exist."
                 }
 
             # Check if it's a directory
-            if os.path.isdir(full_path):
+            if stat.S_ISDIR(st.st_mode):
                 return {
                     "status": "error",
                     "message": f"{normalized_path} is a directory, not a file."
                 }
 
-            # Write the file
-            with open(full_path, 'w') as f:
-                f.write(content)
+            # Write the file, encoded once up front and written straight to the descriptor
+            fd = os.open(full_path, _O_BINARY | os.O_WRONLY | os.O_TRUNC)
+            try:
+                _write_all(fd, content.encode('utf-8'))
+            finally:
+                os.close(fd)
 
             return {
                 "status": "success",
@@ -128,6 +256,157 @@ class FileOperations(MCP):
                 "message": f"Error updating file: {str(e)}"
             }
 
+    def write_file(self, file_path, content, create_ok=True):
+        """
+        Create the file if it does not exist, otherwise overwrite it.
+
+        Whether the file existed is decided by the open call itself, without
+        reading the file or a separate stat.
+
+        :param file_path: Path to the file relative to the project root
+        :param content: Content for the file
+        :param create_ok: Whether a missing file may be created; if False, only existing files are written
+        """
+        logger.info(f"Writing file: {file_path}")
+
+        try:
+            # Normalize the file path to handle any path traversal attempts
+            # Remove any leading slashes to ensure it's relative to the project root
+            normalized_path = file_path.lstrip('/')
+
+            # Security check: make sure the file is within the project directory
+            full_path = self._safe_path(normalized_path)
+            if full_path is None:
+                return {
+                    "status": "error",
+                    "message": "Invalid file path. The file must be within the project directory."
+                }
+
+            created = False
+            if create_ok:
+                # Exclusive create fails if the file exists, which tells us it's an update
+                try:
+                    try:
+                        fd = os.open(full_path, _O_BINARY | os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+                    except FileNotFoundError:
+                        # Create directory if it doesn't exist
+                        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                        fd = os.open(full_path, _O_BINARY | os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+                    created = True
+                except FileExistsError:
+                    pass
+
+            if not created:
+                try:
+                    fd = os.open(full_path, _O_BINARY | os.O_WRONLY | os.O_TRUNC)
+                except FileNotFoundError:
+                    return {
+                        "status": "error",
+                        "message": f"File {normalized_path} does not exist."
+                    }
+                except IsADirectoryError:
+                    return {
+                        "status": "error",
+                        "message": f"{normalized_path} is a directory, not a file."
+                    }
+
+            # Write the file, encoded once up front and written straight to the descriptor
+            try:
+                _write_all(fd, content.encode('utf-8'))
+            finally:
+                os.close(fd)
+
+            action = "created" if created else "updated"
+            return {
+                "status": "success",
+                "message": f"File {normalized_path} {action} successfully.",
+                "file_path": normalized_path
+            }
+
+        except Exception as e:
+            logger.exception(f"Error writing file: {str(e)}")
+            return {
+                "status": "error",
+                "message": f"Error writing file: {str(e)}"
+            }
+
+    @tool(name="copy_file", description="Copy a file to another path in the project")
+    def copy_file(self, src_path, dst_path):
+        """
+        Copy a file to another path in the project, overwriting the destination.
+
+        The data is copied by the kernel (sendfile) without passing through
+        Python buffers where the platform supports it.
+
+        :param src_path: Path to the source file relative to the project root
+        :param dst_path: Path to the destination file relative to the project root
+        """
+        logger.info(f"Copying file: {src_path} -> {dst_path}")
+
+        try:
+            # Normalize the file paths to handle any path traversal attempts
+            # Remove any leading slashes to ensure they're relative to the project root
+            normalized_src = src_path.lstrip('/')
+            normalized_dst = dst_path.lstrip('/')
+
+            # Security check: make sure both files are within the project directory
+            full_src = self._safe_path(normalized_src)
+            full_dst = self._safe_path(normalized_dst)
+            if full_src is None or full_dst is None:
+                return {
+                    "status": "error",
+                    "message": "Invalid file path. The files must be within the project directory."
+                }
+
+            # Check if the source is an existing file
+            if not os.path.isfile(full_src):
+                return {
+                    "status": "error",
+                    "message": f"File {normalized_src} does not exist."
+                }
+
+            # Opening the destination would truncate the source (also through a symlink)
+            if os.path.realpath(full_src) == os.path.realpath(full_dst):
+                return {
+                    "status": "error",
+                    "message": "Source and destination are the same file."
+                }
+
+            # Check if the destination is a directory
+            if os.path.isdir(full_dst):
+                return {
+                    "status": "error",
+                    "message": f"{normalized_dst} is a directory, not a file."
+                }
+
+            # Create directory if it doesn't exist
+            os.makedirs(os.path.dirname(full_dst), exist_ok=True)
+
+            with open(full_src, 'rb') as src, open(full_dst, 'wb') as dst:
+                if hasattr(os, 'sendfile'):
+                    size = os.fstat(src.fileno()).st_size
+                    offset = 0
+                    while offset < size:
+                        sent = os.sendfile(dst.fileno(), src.fileno(), offset, size - offset)
+                        if sent == 0:
+                            break
+                        offset += sent
+                else:
+                    shutil.copyfileobj(src, dst)
+
+            return {
+                "status": "success",
+                "message": f"File {normalized_src} copied to {normalized_dst} successfully.",
+                "file_path": normalized_dst
+            }
+
+        except Exception as e:
+            logger.exception(f"Error copying file: {str(e)}")
+            return {
+                "status": "error",
+                "message": f"Error copying file: {str(e)}"
+            }
+
     @tool(name="delete_file", description="Delete a file or directory")
     def delete_file(self, file_path):
         """
@@ -143,23 +422,32 @@ class FileOperations(MCP):
             normalized_path = file_path.lstrip('/')
 
             # Security check: make sure the file is within the project directory
-            full_path = os.path.join(self.data_dir, normalized_path)
-            if os.path.commonpath([full_path, self.data_dir]) != self.data_dir:
+            full_path = self._safe_path(normalized_path)
+            if full_path is None:
                 return {
                     "status": "error",
                     "message": "Invalid file path. The file must be within the project directory."
                 }
 
-            # Check if the file exists
-            if not os.path.exists(full_path):
+            # Check if the file exists; lstat so that a symlink is seen as the link itself
+            try:
+                st = os.lstat(full_path)
+            except (FileNotFoundError, NotADirectoryError):
                 return {
                     "status": "error",
                     "message": f"File {normalized_path} does not exist."
                 }
 
-            # Delete the file or directory
-            if os.path.isdir(full_path):
-                shutil.rmtree(full_path)
+            # Delete the file or directory; a symlink is unlinked, never its target
+            if stat.S_ISLNK(st.st_mode):
+                os.unlink(full_path)
+                message = f"Link {normalized_path} deleted successfully."
+            elif stat.S_ISDIR(st.st_mode):
+                rm = shutil.which('rm') if USE_FAST_RMTREE and os.name == 'posix' else None
+                if rm:
+                    subprocess.run([rm, '-rf', '--', full_path], check=True, capture_output=True)
+                else:
+                    shutil.rmtree(full_path)
                 message = f"Directory {normalized_path} deleted successfully."
             else:
                 os.remove(full_path)
@@ -179,44 +467,93 @@ class FileOperations(MCP):
             }
 
     @tool(name="read_file", description="Read the content of a file")
-    def read_file(self, file_path):
+    def read_file(self, file_path, offset=0, max_bytes=READ_FILE_MAX_BYTES):
         """
         Read the content of a file.
 
+        Large files can be read in parts: when the result is truncated, call
+        again with offset set to the returned next_offset.
+
         :param file_path: Path to the file relative to the project root
+        :param offset: Byte offset in the file to start reading at (defaults to the start)
+        :param max_bytes: Maximum number of bytes of the file to read
         """
         logger.info(f"Reading file: {file_path}")
 
         try:
+            offset = max(int(offset), 0)
+            # A window must fit at least one whole character
+            max_bytes = max(int(max_bytes), 4)
+
             # Normalize the file path to handle any path traversal attempts
             # Remove any leading slashes to ensure it's relative to the project root
             normalized_path = file_path.lstrip('/')
 
             # Security check: make sure the file is within the project directory
-            full_path = os.path.join(self.data_dir, normalized_path)
-            if os.path.commonpath([full_path, self.data_dir]) != self.data_dir:
+            full_path = self._safe_path(normalized_path)
+            if full_path is None:
                 return {
                     "status": "error",
                     "message": "Invalid file path. The file must be within the project directory."
                 }
 
             # Check if the file exists
-            if not os.path.exists(full_path):
+            st = _stat_or_none(full_path)
+            if st is None:
                 return {
                     "status": "error",
                     "message": f"File {normalized_path} does not exist."
                 }
 
             # Check if it's a directory
-            if os.path.isdir(full_path):
+            if stat.S_ISDIR(st.st_mode):
                 return {
                     "status": "error",
                     "message": f"{normalized_path} is a directory, not a file."
                 }
 
-            # Read the file
-            with open(full_path, 'r') as f:
-                content = f.read()
+            # Map the file rather than reading it through a buffer: pages are
+            # faulted in on demand and only the window returned is copied
+            size = st.st_size
+            content = ""
+            end = offset
+            if offset < size:
+                with open(full_path, 'rb') as f, \
+                        mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                        mm.madvise(mmap.MADV_SEQUENTIAL)
+
+                    # Don't start in the middle of a UTF-8 character
+                    while 0 < offset < size and mm[offset] & 0xC0 == 0x80:
+                        offset += 1
+
+                    end = min(offset + max_bytes, size)
+                    # The incremental decoder leaves a character cut off at the end of
+                    # the window undecoded; the next part starts with it
+                    decoder = codecs.getincrementaldecoder('utf-8')()
+                    content = decoder.decode(mm[offset:end], final=end == size)
+                    end -= len(decoder.getstate()[0])
+
+                    # Don't split a \r\n pair either, or the \r would be translated
+                    # to a newline of its own and the next part would add another
+                    if end < size and mm[end - 1] == 0x0D and mm[end] == 0x0A:
+                        end -= 1
+                        content = content[:-1]
+
+            # Translate newlines as reading in text mode would
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
+
+            if offset > 0 or end < size:
+                return {
+                    "status": "success",
+                    "message": f"Read bytes {offset} to {end} of {size} of file {normalized_path}.",
+                    "file_path": normalized_path,
+                    "content": content,
+                    "truncated": end < size,
+                    "total_size": size,
+                    "offset": offset,
+                    "next_offset": end if end < size else None
+                }
 
             return {
                 "status": "success",
@@ -232,6 +569,51 @@ class FileOperations(MCP):
                 "message": f"Error reading file: {str(e)}"
             }
 
+    @tool(name="read_files", description="Read the content of several files at once")
+    def read_files(self, paths, max_bytes=READ_FILE_MAX_BYTES):
+        """
+        Read the content of several files in one call.
+
+        Each file is read as by read_file; the files are read in parallel.
+
+        :param paths: Comma-separated list of file paths relative to the project root (e.g., "app.py, utils/helpers.py")
+        :param max_bytes: Maximum number of bytes read from each file
+        """
+        logger.info(f"Reading files: {paths}")
+
+        try:
+            if isinstance(paths, str):
+                paths = paths.split(',')
+            paths = [path.strip() for path in paths if path.strip()]
+            if not paths:
+                return {
+                    "status": "error",
+                    "message": "No files specified."
+                }
+
+            with ThreadPoolExecutor(max_workers=min(READ_FILES_MAX_WORKERS, len(paths))) as executor:
+                results = list(executor.map(lambda path: self.read_file(path, max_bytes=max_bytes), paths))
+
+            files = []
+            for path, result in zip(paths, results):
+                result = dict(result)
+                result.setdefault("file_path", path.lstrip('/'))
+                files.append(result)
+
+            failed = sum(1 for result in files if result["status"] != "success")
+            return {
+                "status": "success" if not failed else "error",
+                "message": f"Read {len(files) - failed} of {len(files)} files.",
+                "files": files
+            }
+
+        except Exception as e:
+            logger.exception(f"Error reading files: {str(e)}")
+            return {
+                "status": "error",
+                "message": f"Error reading files: {str(e)}"
+            }
+
     @tool(name="list_files", description="List files and directories in a directory")
     def list_files(self, directory_path=""):
         """
@@ -247,44 +629,42 @@ class FileOperations(MCP):
             normalized_path = directory_path.lstrip('/')
 
             # Security check: make sure the directory is within the project directory
-            full_path = os.path.join(self.data_dir, normalized_path)
-            if os.path.commonpath([full_path, self.data_dir]) != self.data_dir:
+            full_path = self._safe_path(normalized_path)
+            if full_path is None:
                 return {
                     "status": "error",
                     "message": "Invalid directory path. The directory must be within the project directory."
                 }
 
             # Check if the directory exists
-            if not os.path.exists(full_path):
+            st = _stat_or_none(full_path)
+            if st is None:
                 return {
                     "status": "error",
                     "message": f"Directory {normalized_path} does not exist."
                 }
 
             # Check if it's a directory
-            if not os.path.isdir(full_path):
+            if not stat.S_ISDIR(st.st_mode):
                 return {
                     "status": "error",
                     "message": f"{normalized_path} is a file, not a directory."
                 }
 
-            # List files and directories
+            # List files and directories; scandir gets each entry's type along with
+            # its name, so no stat() call per entry is needed
             items = []
-            for item in os.listdir(full_path):
-                item_path = os.path.join(normalized_path, item)
-                item_full_path = os.path.join(self.data_dir, item_path)
-
-                # Skip hidden files
-                if item.startswith('.'):
-                    continue
-
-                is_dir = os.path.isdir(item_full_path)
+            with os.scandir(full_path) as entries:
+                for entry in entries:
+                    # Skip hidden files
+                    if entry.name.startswith('.'):
+                        continue
 
-                items.append({
-                    "name": item,
-                    "path": item_path,
-                    "is_dir": is_dir
-                })
+                    items.append({
+                        "name": entry.name,
+                        "path": os.path.join(normalized_path, entry.name),
+                        "is_dir": entry.is_dir()
+                    })
 
             # Sort items: directories first, then files, both alphabetically
             items.sort(key=lambda x: (not x["is_dir"], x["name"].lower()))
@@ -303,134 +683,238 @@ class FileOperations(MCP):
                 "message": f"Error listing directory: {str(e)}"
             }
 
-    @tool(name="run_file", description="Run a file in the project's container")
-    def run_file(self, file_path):
+    @tool(name="list_tree", description="List all files and directories below a directory")
+    def list_tree(self, directory_path="", max_entries=10000):
         """
-        Run a file in the project's container.
+        List all files and directories below a directory in one call.
 
-        :param file_path: Path to the file to run relative to the project root
+        :param directory_path: Path to the directory relative to the project root (defaults to project root)
+        :param max_entries: Maximum number of entries to return
         """
-        logger.info(f"Running file: {file_path}")
+        logger.info(f"Listing directory tree: {directory_path}")
 
         try:
-            # Normalize the file path to handle any path traversal attempts
+            # Normalize the directory path to handle any path traversal attempts
             # Remove any leading slashes to ensure it's relative to the project root
-            normalized_path = file_path.lstrip('/')
-
-            # Security check: make sure the file is within the project directory
-            full_path = os.path.join(self.data_dir, normalized_path)
-            if os.path.commonpath([full_path, self.data_dir]) != self.data_dir:
-                return {
-                    "status": "error",
-                    "message": "Invalid file path. The file must be within the project directory."
-                }
+            normalized_path = directory_path.lstrip('/')
+            max_entries = int(max_entries)
 
-            # Check if the file exists
-            if not os.path.exists(full_path):
+            # Security check: make sure the directory is within the project directory
+            full_path = self._safe_path(normalized_path)
+            if full_path is None:
                 return {
                     "status": "error",
-                    "message": f"File {normalized_path} does not exist."
+                    "message": "Invalid directory path. The directory must be within the project directory."
                 }
 
             # Check if it's a directory
-            if os.path.isdir(full_path):
+            if not os.path.isdir(full_path):
                 return {
                     "status": "error",
-                    "message": f"{normalized_path} is a directory, not a file."
+                    "message": f"Directory {normalized_path} does not exist."
                 }
 
-            # Check if the container is running
-            container_status = docker_manager.get_container_status(self.project)
-            if container_status != 'running':
-                return {
-                    "status": "error",
-                    "message": f"Container is not running. Current status: {container_status}."
-                }
+            # Walk the tree once; os.walk reads each directory with scandir and
+            # doesn't follow symlinks out of the project
+            items = []
+            truncated = False
+            for dirpath, dirnames, filenames in os.walk(full_path):
+                # Skip hidden directories (pruned in place so they aren't walked) and files
+                dirnames[:] = sorted(d for d in dirnames if not d.startswith('.'))
+                relative_dir = os.path.relpath(dirpath, self._data_dir_real)
+                relative_dir = "" if relative_dir == "." else relative_dir
+
+                for name in dirnames:
+                    items.append({"name": name, "path": os.path.join(relative_dir, name), "is_dir": True})
+                for name in sorted(filenames):
+                    if not name.startswith('.'):
+                        items.append({"name": name, "path": os.path.join(relative_dir, name), "is_dir": False})
+
+                if len(items) >= max_entries:
+                    del items[max_entries:]
+                    truncated = True
+                    break
 
-            # Determine how to run the file based on its extension
-            _, ext = os.path.splitext(normalized_path)
-            ext = ext.lower()
-
-            # Container path to the file
-            container_file_path = f"/app/data/{normalized_path}"
-
-            # Command to run based on file extension
-            command = None
-            if ext == '.py':
-                command = f"python {container_file_path}"
-            elif ext == '.js':
-                command = f"node {container_file_path}"
-            elif ext == '.sh':
-                command = f"bash {container_file_path}"
-            elif ext == '.php':
-                command = f"php {container_file_path}"
-            elif ext == '.rb':
-                command = f"ruby {container_file_path}"
-            elif ext == '.pl':
-                command = f"perl {container_file_path}"
-            elif ext == '.java':
-                # For Java, we need to compile first
-                java_class = os.path.basename(normalized_path).replace('.java', '')
-                command = f"cd $(dirname {container_file_path}) && javac {os.path.basename(container_file_path)} && java {java_class}"
-            elif ext == '.c':
-                # For C, we need to compile first
-                c_out = os.path.basename(normalized_path).replace('.c', '')
-                command = f"cd $(dirname {container_file_path}) && gcc {os.path.basename(container_file_path)} -o {c_out} && ./{c_out}"
-            elif ext == '.cpp':
-                # For C++, we need to compile first
-                cpp_out = os.path.basename(normalized_path).replace('.cpp', '')
-                command = f"cd $(dirname {container_file_path}) && g++ {os.path.basename(container_file_path)} -o {cpp_out} && ./{cpp_out}"
-            else:
-                return {
-                    "status": "error",
-                    "message": f"Unsupported file type: {ext}. Cannot determine how to run this file."
-                }
+            return {
+                "status": "success",
+                "message": f"Directory tree of {normalized_path} listed successfully.",
+                "directory_path": normalized_path,
+                "items": items,
+                "truncated": truncated
+            }
 
-            # Execute the command in the container
-            container_id = self.project.container_id
-            exec_command = ["docker", "exec", container_id, "bash", "-c", command]
+        except Exception as e:
+            logger.exception(f"Error listing directory tree: {str(e)}")
+            return {
+                "status": "error",
+                "message": f"Error listing directory tree: {str(e)}"
+            }
 
-            logger.info(f"Executing command in container: {' '.join(exec_command)}")
+    def _prepare_run(self, file_path):
+        """
+        Validate a file for running and build the shell command for it.
 
-            # Run the command and capture output
-            result = subprocess.run(
-                exec_command,
-                capture_output=True,
-                text=True,
-                timeout=30  # 30 second timeout
-            )
+        :param file_path: Path to the file to run relative to the project root
+        :return: Tuple of (normalized_path, command, error), where error is an
+                 error result dict or None
+        """
+        # Normalize the file path to handle any path traversal attempts
+        # Remove any leading slashes to ensure it's relative to the project root
+        normalized_path = file_path.lstrip('/')
+
+        # Security check: make sure the file is within the project directory
+        full_path = self._safe_path(normalized_path)
+        if full_path is None:
+            return normalized_path, None, {
+                "status": "error",
+                "message": "Invalid file path. The file must be within the project directory."
+            }
 
-            # Prepare the output
-            stdout = result.stdout.strip()
-            stderr = result.stderr.strip()
+        # Check if the file exists
+        st = _stat_or_none(full_path)
+        if st is None:
+            return normalized_path, None, {
+                "status": "error",
+                "message": f"File {normalized_path} does not exist."
+            }
 
-            if result.returncode == 0:
-                status = "success"
-                if not stdout and not stderr:
-                    message = f"File {normalized_path} executed successfully with no output."
-                else:
-                    message = f"File {normalized_path} executed successfully."
-            else:
-                status = "error"
-                message = f"Error executing file {normalized_path}."
+        # Check if it's a directory
+        if stat.S_ISDIR(st.st_mode):
+            return normalized_path, None, {
+                "status": "error",
+                "message": f"{normalized_path} is a directory, not a file."
+            }
 
-            return {
-                "status": status,
-                "message": message,
-                "file_path": normalized_path,
-                "command": command,
-                "stdout": stdout,
-                "stderr": stderr,
-                "return_code": result.returncode
+        # Check if the container is running
+        container_status = get_docker_manager().get_container_status(self.project)
+        if container_status != 'running':
+            return normalized_path, None, {
+                "status": "error",
+                "message": f"Container is not running. Current status: {container_status}."
+            }
+
+        # Determine how to run the file based on its extension
+        name = os.path.basename(normalized_path)
+        stem, ext = os.path.splitext(name)
+        runner = _RUNNERS.get(ext.lower())
+        if runner is None:
+            return normalized_path, None, {
+                "status": "error",
+                "message": f"Unsupported file type: {ext.lower()}. Cannot determine how to run this file."
             }
 
-        except subprocess.TimeoutExpired:
+        # Container path to the file
+        container_file_path = f"/app/data/{normalized_path}"
+        command = runner(container_file_path, name, os.path.dirname(container_file_path), stem)
+
+        return normalized_path, command, None
+
+    @tool(name="run_file", description="Run a file in the project's container")
+    def run_file(self, file_path):
+        """
+        Run a file in the project's container.
+
+        :param file_path: Path to the file to run relative to the project root
+        """
+        logger.info(f"Running file: {file_path}")
+
+        try:
+            normalized_path, command, error = self._prepare_run(file_path)
+            if error:
+                return error
+
+            logger.info(f"Executing command in container {self.project.container_id}: {command}")
+
+            # Execute the command in the container and capture output
+            stdout, stderr, return_code, timed_out = get_docker_manager().exec_command(
+                self.project, command, timeout=RUN_TIMEOUT, max_output_bytes=RUN_OUTPUT_MAX_BYTES
+            )
+
+            if timed_out:
+                return {
+                    "status": "error",
+                    "message": f"Execution timed out after {RUN_TIMEOUT} seconds.",
+                    "file_path": normalized_path,
+                    "command": command
+                }
+
+            # Prepare the output
+            return self._run_result(normalized_path, command, stdout.strip(),
+                                    stderr.strip(), return_code)
+
+        except Exception as e:
+            logger.exception(f"Error running file: {str(e)}")
             return {
                 "status": "error",
-                "message": f"Execution timed out after 30 seconds.",
-                "file_path": normalized_path,
-                "command": command if 'command' in locals() else None
+                "message": f"Error running file: {str(e)}",
+                "file_path": normalized_path if 'normalized_path' in locals() else file_path
+            }
+
+    def run_file_stream(self, file_path, on_output=None, max_lines=RUN_OUTPUT_MAX_LINES):
+        """
+        Run a file in the project's container, handling its output line by line.
+
+        Output is read while the process runs instead of being buffered until it
+        exits. Only the last max_lines lines of each stream are kept for the result.
+
+        :param file_path: Path to the file to run relative to the project root
+        :param on_output: Optional callable invoked as on_output(stream, line) for
+                          every line, where stream is "stdout" or "stderr"
+        :param max_lines: Number of trailing lines of each stream to return
+        :return: The same result dict as run_file
+        """
+        logger.info(f"Running file (streaming): {file_path}")
+
+        try:
+            normalized_path, command, error = self._prepare_run(file_path)
+            if error:
+                return error
+
+            logger.info(f"Executing command in container {self.project.container_id}: {command}")
+
+            tails = {
+                "stdout": collections.deque(maxlen=max_lines),
+                "stderr": collections.deque(maxlen=max_lines),
             }
+            decoders = {name: codecs.getincrementaldecoder('utf-8')('replace') for name in tails}
+            # Text after the last newline of each stream, completed by the next chunk
+            partial_lines = {name: "" for name in tails}
+
+            def handle_line(stream_name, line):
+                line = line.rstrip('\r')
+                tails[stream_name].append(line)
+                if on_output is not None:
+                    on_output(stream_name, line)
+
+            def handle_chunk(stream_name, chunk):
+                text = partial_lines[stream_name] + decoders[stream_name].decode(chunk)
+                *complete_lines, partial_lines[stream_name] = text.split('\n')
+                for line in complete_lines:
+                    handle_line(stream_name, line)
+
+            # Execute the command in the container, handling output as it arrives
+            _, _, return_code, timed_out = get_docker_manager().exec_command(
+                self.project, command, timeout=RUN_TIMEOUT,
+                max_output_bytes=RUN_OUTPUT_MAX_BYTES, on_output=handle_chunk
+            )
+
+            # Flush the last line of each stream if it had no trailing newline
+            for stream_name, decoder in decoders.items():
+                line = partial_lines[stream_name] + decoder.decode(b'', final=True)
+                if line:
+                    handle_line(stream_name, line)
+
+            if timed_out:
+                return {
+                    "status": "error",
+                    "message": f"Execution timed out after {RUN_TIMEOUT} seconds.",
+                    "file_path": normalized_path,
+                    "command": command
+                }
+
+            return self._run_result(normalized_path, command, "\n".join(tails["stdout"]).strip(),
+                                    "\n".join(tails["stderr"]).strip(), return_code)
+
         except Exception as e:
             logger.exception(f"Error running file: {str(e)}")
             return {
@@ -439,6 +923,37 @@ class FileOperations(MCP):
                 "file_path": normalized_path if 'normalized_path' in locals() else file_path
             }
 
+    @staticmethod
+    def _run_result(normalized_path, command, stdout, stderr, return_code):
+        """
+        Build the result dict for a finished run.
+
+        :param normalized_path: Path of the file that was run
+        :param command: Command that was executed in the container
+        :param stdout: Captured standard output
+        :param stderr: Captured standard error
+        :param return_code: Exit code of the command
+        """
+        if return_code == 0:
+            status = "success"
+            if not stdout and not stderr:
+                message = f"File {normalized_path} executed successfully with no output."
+            else:
+                message = f"File {normalized_path} executed successfully."
+        else:
+            status = "error"
+            message = f"Error executing file {normalized_path}."
+
+        return {
+            "status": status,
+            "message": message,
+            "file_path": normalized_path,
+            "command": command,
+            "stdout": stdout,
+            "stderr": stderr,
+            "return_code": return_code
+        }
+
     @tool(name="generate_diff", description="Generate a diff between original and new content")
     def generate_diff(self, original_content, new_content, file_path=None):
         """
@@ -514,7 +1029,7 @@ class FileOperations(MCP):
                 }
 
             # Check if the container is running
-            container_status = docker_manager.get_container_status(self.project)
+            container_status = get_docker_manager().get_container_status(self.project)
             if container_status != 'running':
                 return {
                     "status": "error",
@@ -524,25 +1039,27 @@ class FileOperations(MCP):
             # Prepare the pip install command
             command = f"pip install {packages}"
 
-            # Execute the command in the container
-            container_id = self.project.container_id
-            exec_command = ["docker", "exec", container_id, "bash", "-c", command]
-
-            logger.info(f"Executing pip install in container: {' '.join(exec_command)}")
+            logger.info(f"Executing pip install in container {self.project.container_id}: {command}")
 
             # Run the command and capture output
-            result = subprocess.run(
-                exec_command,
-                capture_output=True,
-                text=True,
+            stdout, stderr, return_code, timed_out = get_docker_manager().exec_command(
+                self.project, command,
                 timeout=120  # 2 minute timeout for pip installations
             )
 
+            if timed_out:
+                return {
+                    "status": "error",
+                    "message": f"Installation timed out after 120 seconds.",
+                    "packages": packages,
+                    "command": command
+                }
+
             # Prepare the output
-            stdout = result.stdout.strip()
-            stderr = result.stderr.strip()
+            stdout = stdout.strip()
+            stderr = stderr.strip()
 
-            if result.returncode == 0:
+            if return_code == 0:
                 status = "success"
                 message = f"Packages installed successfully: {packages}"
             else:
@@ -556,16 +1073,9 @@ class FileOperations(MCP):
                 "command": command,
                 "stdout": stdout,
                 "stderr": stderr,
-                "return_code": result.returncode
+                "return_code": return_code
             }
 
-        except subprocess.TimeoutExpired:
-            return {
-                "status": "error",
-                "message": f"Installation timed out after 120 seconds.",
-                "packages": packages,
-                "command": command if 'command' in locals() else None
-            }
         except Exception as e:
             logger.exception(f"Error installing packages: {str(e)}")
             return {
@@ -590,22 +1100,23 @@ class FileOperations(MCP):
             normalized_path = file_path.lstrip('/')
 
             # Security check: make sure the file is within the project directory
-            full_path = os.path.join(self.data_dir, normalized_path)
-            if os.path.commonpath([full_path, self.data_dir]) != self.data_dir:
+            full_path = self._safe_path(normalized_path)
+            if full_path is None:
                 return {
                     "status": "error",
                     "message": "Invalid file path. The file must be within the project directory."
                 }
 
             # Check if the file exists
-            if not os.path.exists(full_path):
+            st = _stat_or_none(full_path)
+            if st is None:
                 return {
                     "status": "error",
                     "message": f"File {normalized_path} does not exist."
                 }
 
             # Check if it's a directory
-            if os.path.isdir(full_path):
+            if stat.S_ISDIR(st.st_mode):
                 return {
                     "status": "error",
                     "message": f"{normalized_path} is a directory, not a file."
@@ -626,8 +1137,8 @@ class FileOperations(MCP):
                 }
 
             # Write the patched content back to the file
-            with open(full_path, 'w') as f:
-                f.write(new_content)
+            with open(full_path, 'wb') as f:
+                f.write(new_content.encode('utf-8'))
 
             return {
                 "status": "success",
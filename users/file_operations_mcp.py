@@ -354,8 +354,8 @@ class FileOperationsMCP(ModelContextProtocol):
                 }
 
             # Check if the container is running
-            from .docker_utils import docker_manager
-            container_status = docker_manager.get_container_status(self.project)
+            from .docker_utils import get_docker_manager
+            container_status = get_docker_manager().get_container_status(self.project)
             if container_status != 'running':
                 return {
                     "status": "error",
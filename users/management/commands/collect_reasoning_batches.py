@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from users.ai_reasoning import AIReasoning
+from users.models import ReasoningSession
+
+class Command(BaseCommand):
+    help = 'Writes the results of finished OpenAI reasoning batches into their reasoning steps'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wait', action='store_true', help='Keep polling until every batch has finished')
+        parser.add_argument('--interval', type=int, default=60, help='Seconds between polls with --wait')
+
+    def handle(self, *args, **options):
+        while True:
+            pending = (
+                ReasoningSession.objects
+                .filter(mode='batch', is_complete=False, batch_id__isnull=False)
+                .select_related('user__profile')
+            )
+            # One API key per batch is enough; all its sessions belong to the same user
+            batches = {session.batch_id: session.user.profile.openai_api_key for session in pending}
+
+            for batch_id, api_key in batches.items():
+                try:
+                    status = AIReasoning.collect_batch(batch_id, api_key)
+                    self.stdout.write(f'  - Batch {batch_id}: {status}')
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f'  - Batch {batch_id}: {e}'))
+
+            if not batches or not options['wait']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Checked {len(batches)} reasoning batches'))
@@ -70,6 +70,10 @@ def tool(name=None, description=None):
             "definition": tool_def
         }
         
+        # Tag the function so MCP subclasses can collect their tools when defined
+        func._mcp_tool_name = tool_name
+        func._mcp_tool_definition = tool_def
+        
         # Return the original function unchanged
         return func
     
@@ -82,18 +86,25 @@ class MCP:
     Handles tool registration and execution.
     """
     
+    # Tool functions of the class by tool name, collected once when the class is defined
+    _TOOLS = {}
+    
+    def __init_subclass__(cls, **kwargs):
+        """Collect the tools of a subclass, including inherited ones, sorted by name."""
+        super().__init_subclass__(**kwargs)
+        tools = {}
+        for klass in reversed(cls.__mro__):
+            for func in vars(klass).values():
+                if hasattr(func, '_mcp_tool_name'):
+                    tools[func._mcp_tool_name] = func
+        cls._TOOLS = dict(sorted(tools.items()))
+    
     def __init__(self):
-        """Initialize the MCP with tools from the registry."""
-        self.tools = {}
-        self.tool_definitions = []
-        
-        # Find all tools defined in this class
-        for name, method in inspect.getmembers(self, inspect.ismethod):
-            if name in TOOL_REGISTRY:
-                # Register the method as a tool
-                self.tools[name] = method
-                self.tool_definitions.append(TOOL_REGISTRY[name]["definition"])
-                logger.info(f"Registered tool: {name}")
+        """Initialize the MCP with the tools of its class."""
+        # Bind the class's tools to this instance
+        self.tools = {name: func.__get__(self) for name, func in self._TOOLS.items()}
+        self.tool_definitions = [func._mcp_tool_definition for func in self._TOOLS.values()]
+        logger.debug(f"Registered tools: {', '.join(self.tools)}")
     
     def get_tools(self):
         """Get the list of tool definitions for OpenAI API."""
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-15 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_userprofile_chat_panel_width_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reasoningstep',
+            name='summary',
+            field=models.TextField(blank=True, help_text='Condensed response passed on to later steps'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-15 10:03
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def set_next_step_number(apps, schema_editor):
+    """Continue numbering existing sessions after their last step."""
+    ReasoningSession = apps.get_model('users', 'ReasoningSession')
+    sessions = ReasoningSession.objects.annotate(last_step_number=Max('steps__step_number')).filter(
+        last_step_number__isnull=False
+    )
+    for session in sessions:
+        session.next_step_number = session.last_step_number + 1
+        session.save(update_fields=['next_step_number'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_reasoningstep_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reasoningsession',
+            name='next_step_number',
+            field=models.PositiveIntegerField(default=1, help_text='Number the next step of this session will get'),
+        ),
+        migrations.RunPython(set_next_step_number, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-15 11:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_reasoningsession_next_step_number'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reasoningsession',
+            name='mode',
+            field=models.CharField(choices=[('interactive', 'Interactive'), ('batch', 'Batch')], default='interactive', help_text='Whether the steps run immediately or through the OpenAI Batch API', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='reasoningsession',
+            name='batch_id',
+            field=models.CharField(blank=True, help_text="OpenAI batch the session's steps were submitted in", max_length=64, null=True),
+        ),
+    ]
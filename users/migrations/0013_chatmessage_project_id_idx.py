@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-15 11:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_reasoningsession_mode_batch_id'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['project', 'id'], name='chatmessage_project_id_idx'),
+        ),
+    ]
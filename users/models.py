@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.db.models.signals import post_save
@@ -101,6 +102,9 @@ class ChatMessage(models.Model):
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            models.Index(fields=['project', 'id'], name='chatmessage_project_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.role} message in {self.project.title} at {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
@@ -115,6 +119,12 @@ class ReasoningSession(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_complete = models.BooleanField(default=False)
+    next_step_number = models.PositiveIntegerField(default=1, help_text="Number the next step of this session will get")
+    mode = models.CharField(max_length=20, default='interactive', choices=[
+        ('interactive', 'Interactive'),
+        ('batch', 'Batch')
+    ], help_text="Whether the steps run immediately or through the OpenAI Batch API")
+    batch_id = models.CharField(max_length=64, blank=True, null=True, help_text="OpenAI batch the session's steps were submitted in")
 
     class Meta:
         ordering = ['-created_at']
@@ -122,6 +132,20 @@ class ReasoningSession(models.Model):
     def __str__(self):
         return f"Reasoning session: {self.title} for {self.project.title}"
 
+    def reserve_step_numbers(self, count=1):
+        """
+        Atomically reserve consecutive step numbers for this session.
+
+        Safe to call concurrently: every caller gets its own numbers.
+        Returns the first reserved number.
+        """
+        with transaction.atomic():
+            ReasoningSession.objects.filter(pk=self.pk).update(next_step_number=F('next_step_number') + count)
+            self.next_step_number = ReasoningSession.objects.values_list(
+                'next_step_number', flat=True
+            ).get(pk=self.pk)
+        return self.next_step_number - count
+
 
 class ReasoningStep(models.Model):
     """Model representing a step in an AI reasoning session."""
@@ -138,6 +162,7 @@ class ReasoningStep(models.Model):
     ])
     prompt = models.TextField()
     response = models.TextField(blank=True)
+    summary = models.TextField(blank=True, help_text="Condensed response passed on to later steps")
     model_used = models.CharField(max_length=50, default='gpt-4o')
     tool_calls = models.JSONField(null=True, blank=True)
     tool_results = models.JSONField(null=True, blank=True)
@@ -13,7 +13,6 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 
 from .models import Project, UserProfile, ReasoningSession, ReasoningStep
-from .ai_reasoning import AIReasoning
 
 logger = logging.getLogger(__name__)
 
@@ -105,7 +104,8 @@ def start_reasoning(request, pk):
             'current_file_content': data.get('current_file_content')
         }
         
-        # Initialize the AI reasoning system
+        # Initialize the AI reasoning system (imported lazily, as it loads LangChain)
+        from .ai_reasoning import AIReasoning
         reasoning = AIReasoning(project, user_profile.openai_api_key)
         
         # Create a new session
@@ -180,7 +180,8 @@ def execute_reasoning_step(request, pk, session_id):
                 'message': 'Step type and prompt are required'
             }, status=400)
         
-        # Initialize the AI reasoning system
+        # Initialize the AI reasoning system (imported lazily, as it loads LangChain)
+        from .ai_reasoning import AIReasoning
         reasoning = AIReasoning(project, user_profile.openai_api_key)
         
         # Execute the step
@@ -257,7 +258,8 @@ def execute_full_reasoning(request, pk):
             'current_file_content': data.get('current_file_content')
         }
         
-        # Initialize the AI reasoning system
+        # Initialize the AI reasoning system (imported lazily, as it loads LangChain)
+        from .ai_reasoning import AIReasoning
         reasoning = AIReasoning(project, user_profile.openai_api_key)
         
         # Execute the full reasoning chain
@@ -0,0 +1,99 @@
+"""
+Semantic cache for reasoning step responses.
+
+Prompts are embedded and compared by cosine similarity, so a prompt that
+differs from an earlier one only in wording or whitespace can reuse its
+response. Entries are kept in the Django cache, so they are shared between
+processes and persisted when a shared or file-based backend is configured.
+Each scope stores its prompt embeddings as one float32 matrix, so a lookup
+is a single matrix-vector product.
+"""
+
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+from django.core.cache import cache as django_cache
+from langchain_openai import OpenAIEmbeddings
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """Cache of responses keyed by prompt embeddings, scoped per project and step type."""
+
+    def __init__(self, api_key: str, threshold: float, embed_model: str = "text-embedding-3-small",
+                 max_entries: int = 200, timeout: int = 60 * 60 * 24, http_client=None):
+        """
+        Initialize the semantic cache.
+
+        Args:
+            api_key: OpenAI API key used for embeddings
+            threshold: Minimum cosine similarity for a cached response to be reused
+            embed_model: OpenAI embedding model
+            max_entries: Maximum number of entries kept per scope (oldest are dropped)
+            timeout: Seconds to keep the entries of a scope
+            http_client: Optional httpx client for the embeddings API
+        """
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.embeddings = OpenAIEmbeddings(model=embed_model, api_key=api_key, http_client=http_client)
+
+    @staticmethod
+    def _cache_key(project_id: int, step_type: str) -> str:
+        return f"reasoning_semantic:{project_id}:{step_type}"
+
+    def lookup(self, project_id: int, step_type: str, prompt: str) -> Tuple[Optional[str], Optional[np.ndarray]]:
+        """
+        Find the cached response of the most similar earlier prompt.
+
+        Args:
+            project_id: ID of the project the step belongs to
+            step_type: Type of reasoning step
+            prompt: Prompt for the step
+
+        Returns:
+            Tuple of (response, embedding). The response is None when no
+            cached prompt is similar enough; the embedding can be passed to
+            insert() to store the new response without embedding it again.
+            Both are None if the prompt could not be embedded.
+        """
+        try:
+            vector = np.asarray(self.embeddings.embed_query(prompt), dtype=np.float32)
+        except Exception as e:
+            logger.exception(f"Error embedding prompt for semantic cache: {str(e)}")
+            return None, None
+
+        vector /= np.linalg.norm(vector) or 1.0
+
+        entries = django_cache.get(self._cache_key(project_id, step_type))
+        if entries and entries["vectors"].shape[1] == vector.shape[0]:
+            # One matrix-vector product scores every cached prompt of the scope
+            similarities = entries["vectors"] @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                logger.info(f"Semantic cache hit for {step_type} step (similarity {similarities[best]:.3f})")
+                return entries["responses"][best], vector
+
+        return None, vector
+
+    def insert(self, project_id: int, step_type: str, embedding: np.ndarray, response: str):
+        """
+        Store a response under the embedding of its prompt.
+
+        Args:
+            project_id: ID of the project the step belongs to
+            step_type: Type of reasoning step
+            embedding: Normalized prompt embedding returned by lookup()
+            response: Response to cache
+        """
+        key = self._cache_key(project_id, step_type)
+        entries = django_cache.get(key)
+        if entries and entries["vectors"].shape[1] == embedding.shape[0]:
+            vectors = np.vstack([entries["vectors"], embedding])[-self.max_entries:]
+            responses = (entries["responses"] + [response])[-self.max_entries:]
+        else:
+            vectors = embedding[np.newaxis, :]
+            responses = [response]
+        django_cache.set(key, {"vectors": vectors, "responses": responses}, self.timeout)
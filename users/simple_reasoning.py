@@ -698,8 +698,7 @@ class SimpleReasoning:
         """
         # Determine step number if not provided
         if step_number is None:
-            last_step = session.steps.order_by('-step_number').first()
-            step_number = 1 if last_step is None else last_step.step_number + 1
+            step_number = session.reserve_step_numbers()
 
         # Create the step record
         step = ReasoningStep.objects.create(
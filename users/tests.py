@@ -1,3 +1,371 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from .adapters import NoNewUsersAccountAdapter
+from .ai_protocol import AIProtocol
+from .chat_reasoning import _IMPERATIVE_VERBS, _is_complex_task
+from .docker_utils import DockerManager
+from .file_operations import FileOperations
+from .models import Project, ReasoningSession
+
+
+class FileOperationsTestCase(TestCase):
+    """Base class for tests of FileOperations, with a project in a temporary data directory."""
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir)
+        settings_override = override_settings(BASE_DIR=self.base_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.user = User.objects.create_user(username='tester', email='tester@example.com', password='secret')
+        self.project = Project.objects.create(title='Test project', user=self.user)
+        self.file_ops = FileOperations(self.project, self.user)
+        self.data_dir = self.project.get_data_directory()
+
+    def write(self, relative_path, data):
+        """Write bytes to a file in the project directory."""
+        full_path = os.path.join(self.data_dir, relative_path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'wb') as f:
+            f.write(data)
+        return full_path
+
+
+class SafePathTests(FileOperationsTestCase):
+    def test_rejects_traversal(self):
+        self.assertIsNone(self.file_ops._safe_path('../outside.txt'))
+        self.assertIsNone(self.file_ops._safe_path('src/../../outside.txt'))
+
+    def test_rejects_symlink_out_of_project(self):
+        outside = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, outside)
+        os.symlink(outside, os.path.join(self.data_dir, 'escape'))
+
+        self.assertIsNone(self.file_ops._safe_path('escape'))
+        self.assertEqual(self.file_ops.read_file('escape/secret.txt')['status'], 'error')
+
+    def test_returns_unresolved_path_of_symlink(self):
+        self.write('src/main.py', b'print(1)\n')
+        os.symlink(os.path.join(self.data_dir, 'src'), os.path.join(self.data_dir, 'link'))
+
+        full_path = self.file_ops._safe_path('link')
+        self.assertEqual(os.path.basename(full_path), 'link')
+        self.assertTrue(os.path.islink(full_path))
+
+    def test_delete_symlinked_directory_removes_only_link(self):
+        self.write('src/main.py', b'print(1)\n')
+        link = os.path.join(self.data_dir, 'link')
+        os.symlink(os.path.join(self.data_dir, 'src'), link)
+
+        result = self.file_ops.delete_file('link')
+
+        self.assertEqual(result['status'], 'success')
+        self.assertFalse(os.path.lexists(link))
+        self.assertTrue(os.path.isfile(os.path.join(self.data_dir, 'src', 'main.py')))
+
+    def test_delete_symlinked_file_removes_only_link(self):
+        target = self.write('main.py', b'print(1)\n')
+        link = os.path.join(self.data_dir, 'link.py')
+        os.symlink(target, link)
+
+        result = self.file_ops.delete_file('link.py')
+
+        self.assertEqual(result['status'], 'success')
+        self.assertFalse(os.path.lexists(link))
+        self.assertTrue(os.path.isfile(target))
+
+    def test_copy_onto_symlink_to_source_is_refused(self):
+        target = self.write('main.py', b'print(1)\n')
+        os.symlink(target, os.path.join(self.data_dir, 'link.py'))
+
+        result = self.file_ops.copy_file('main.py', 'link.py')
+
+        self.assertEqual(result['status'], 'error')
+        with open(target, 'rb') as f:
+            self.assertEqual(f.read(), b'print(1)\n')
+
+
+class AIProtocolReadFileTests(FileOperationsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.protocol = AIProtocol(self.project, self.user)
+
+    def test_reads_utf8_file(self):
+        self.write('main.py', 'print("\u00e9")\n'.encode('utf-8'))
+
+        result = self.protocol.read_file('main.py')
+
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['content'], 'print("\u00e9")\n')
+
+    def test_refuses_binary_file(self):
+        self.write('image.png', b'\x89PNG\r\n\x1a\n\x00\xff')
+
+        result = self.protocol.read_file('image.png')
+
+        self.assertEqual(result['status'], 'error')
+        self.assertIn('not a UTF-8 text file', result['message'])
+
+
+class AIProtocolSymlinkTests(FileOperationsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.protocol = AIProtocol(self.project, self.user)
+
+    def test_delete_symlinked_directory_removes_only_link(self):
+        self.write('src/main.py', b'print(1)\n')
+        link = os.path.join(self.data_dir, 'link')
+        os.symlink(os.path.join(self.data_dir, 'src'), link)
+
+        result = self.protocol.delete_file('link')
+
+        self.assertEqual(result['status'], 'success')
+        self.assertFalse(os.path.lexists(link))
+        self.assertTrue(os.path.isfile(os.path.join(self.data_dir, 'src', 'main.py')))
+
+    def test_delete_symlinked_file_removes_only_link(self):
+        target = self.write('main.py', b'print(1)\n')
+        link = os.path.join(self.data_dir, 'link.py')
+        os.symlink(target, link)
+
+        result = self.protocol.delete_file('link.py')
+
+        self.assertEqual(result['status'], 'success')
+        self.assertFalse(os.path.lexists(link))
+        self.assertTrue(os.path.isfile(target))
+
+
+class ReadFileWindowTests(FileOperationsTestCase):
+    # One-, two-, three- and four-byte characters, so windows end inside characters
+    CONTENT = 'ab\u00e9\u20ac\U0001f600z\n' * 3
+
+    def test_windows_reassemble_multibyte_content(self):
+        self.write('text.txt', self.CONTENT.encode('utf-8'))
+
+        parts = []
+        offset = 0
+        while offset is not None:
+            result = self.file_ops.read_file('text.txt', offset=offset, max_bytes=4)
+            self.assertEqual(result['status'], 'success')
+            parts.append(result['content'])
+            offset = result['next_offset']
+            self.assertLess(len(parts), 100)
+
+        self.assertEqual(''.join(parts), self.CONTENT)
+
+    def test_windows_reassemble_crlf_content(self):
+        content = 'abc\r\ndef\r\n\r\nghi\rjkl\r\n'
+        self.write('text.txt', content.encode('utf-8'))
+        whole = self.file_ops.read_file('text.txt')['content']
+
+        for max_bytes in range(4, 9):
+            parts = []
+            offset = 0
+            while offset is not None:
+                result = self.file_ops.read_file('text.txt', offset=offset, max_bytes=max_bytes)
+                parts.append(result['content'])
+                offset = result['next_offset']
+                self.assertLess(len(parts), 100)
+
+            with self.subTest(max_bytes=max_bytes):
+                self.assertEqual(''.join(parts), whole)
+
+    def test_offset_inside_character_starts_at_next_character(self):
+        self.write('text.txt', self.CONTENT.encode('utf-8'))
+
+        # Byte 3 is the second byte of the two-byte character
+        result = self.file_ops.read_file('text.txt', offset=3)
+
+        self.assertEqual(result['offset'], 4)
+        self.assertEqual(result['content'], self.CONTENT[3:])
+        self.assertFalse(result['truncated'])
+        self.assertIsNone(result['next_offset'])
+
+    def test_first_window_is_marked_truncated(self):
+        data = self.CONTENT.encode('utf-8')
+        self.write('text.txt', data)
+
+        # The fifth byte is the first of the three-byte character
+        result = self.file_ops.read_file('text.txt', max_bytes=5)
+
+        self.assertEqual(result['content'], 'ab\u00e9')
+        self.assertTrue(result['truncated'])
+        self.assertEqual(result['total_size'], len(data))
+        self.assertEqual(result['next_offset'], 4)
+
+
+class CreateAndWriteFileTests(FileOperationsTestCase):
+    def read(self, relative_path):
+        with open(os.path.join(self.data_dir, relative_path), 'rb') as f:
+            return f.read()
+
+    def test_create_file_creates_missing_directories(self):
+        result = self.file_ops.create_file('src/pkg/main.py', 'print(1)\n')
+
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(self.read('src/pkg/main.py'), b'print(1)\n')
+
+    def test_create_file_does_not_overwrite_existing_file(self):
+        self.write('main.py', b'original\n')
+
+        result = self.file_ops.create_file('main.py', 'replaced\n')
+
+        self.assertEqual(result['status'], 'error')
+        self.assertIn('already exists', result['message'])
+        self.assertEqual(self.read('main.py'), b'original\n')
+
+    def test_write_file_creates_missing_file(self):
+        result = self.file_ops.write_file('src/main.py', 'print(1)\n')
+
+        self.assertEqual(result['status'], 'success')
+        self.assertIn('created', result['message'])
+        self.assertEqual(self.read('src/main.py'), b'print(1)\n')
+
+    def test_write_file_updates_existing_file(self):
+        self.write('main.py', b'a much longer original content\n')
+
+        result = self.file_ops.write_file('main.py', 'short\n')
+
+        self.assertEqual(result['status'], 'success')
+        self.assertIn('updated', result['message'])
+        self.assertEqual(self.read('main.py'), b'short\n')
+
+    def test_write_file_without_create_ok_updates_existing_file(self):
+        self.write('main.py', b'original\n')
+
+        result = self.file_ops.write_file('main.py', 'replaced\n', create_ok=False)
+
+        self.assertEqual(result['status'], 'success')
+        self.assertIn('updated', result['message'])
+        self.assertEqual(self.read('main.py'), b'replaced\n')
+
+    def test_write_file_without_create_ok_refuses_missing_file(self):
+        result = self.file_ops.write_file('main.py', 'print(1)\n', create_ok=False)
+
+        self.assertEqual(result['status'], 'error')
+        self.assertIn('does not exist', result['message'])
+        self.assertFalse(os.path.exists(os.path.join(self.data_dir, 'main.py')))
+
+    def test_write_file_refuses_directory(self):
+        os.makedirs(os.path.join(self.data_dir, 'src'))
+
+        result = self.file_ops.write_file('src', 'print(1)\n')
+
+        self.assertEqual(result['status'], 'error')
+        self.assertIn('is a directory', result['message'])
+
+
+class ReserveStepNumbersTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='tester', email='tester@example.com', password='secret')
+        project = Project.objects.create(title='Test project', user=user)
+        self.session = ReasoningSession.objects.create(project=project, user=user, title='Test session')
+
+    def test_reserves_consecutive_numbers(self):
+        self.assertEqual(self.session.reserve_step_numbers(), 1)
+        self.assertEqual(self.session.reserve_step_numbers(3), 2)
+        self.assertEqual(self.session.reserve_step_numbers(), 5)
+        self.assertEqual(self.session.next_step_number, 6)
+
+    def test_stale_instances_get_distinct_numbers(self):
+        other = ReasoningSession.objects.get(pk=self.session.pk)
+
+        first = self.session.reserve_step_numbers(2)
+        second = other.reserve_step_numbers(2)
+
+        self.assertEqual((first, second), (1, 3))
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.next_step_number, 5)
+
+
+def _is_complex_by_sentence_split(message):
+    """The multiple-instructions check as it was written before the regex scan."""
+    sentences = [s.strip() for s in message.split('.') if s.strip()]
+    imperative_count = 0
+    for sentence in sentences:
+        words = sentence.lower().split()
+        if words and words[0] in _IMPERATIVE_VERBS:
+            imperative_count += 1
+    return imperative_count >= 2
+
+
+@mock.patch('users.chat_reasoning._get_complex_task_classifier', return_value=None)
+class IsComplexTaskTests(SimpleTestCase):
+    MESSAGES = [
+        "",
+        "Fix the typo.",
+        "Create a file. Run it.",
+        "create a file.run it",
+        "  Create a file.\n\nRun it and show me.",
+        "Create, then run the file. Run it again.",
+        "Create-it. Run it.",
+        "Test-driven please. Run the tests.",
+        "Write tests.. . Execute them...",
+        "Update the README. Please run the linter.",
+        "Set up the project. Configure the database.",
+        "Add logging. Remove prints. Install requests.",
+        "What does this function do? Explain it.",
+    ]
+
+    def test_keyword_marks_complex(self, _classifier):
+        self.assertTrue(_is_complex_task("Please build a todo app"))
+        self.assertTrue(_is_complex_task("Do it STEP BY STEP"))
+
+    def test_matches_sentence_split(self, _classifier):
+        for message in self.MESSAGES:
+            with self.subTest(message=message):
+                self.assertEqual(_is_complex_task(message), _is_complex_by_sentence_split(message))
+
+
+class ExecCommandTimeoutTests(SimpleTestCase):
+    def exec_command(self, exit_code, elapsed):
+        """Run exec_command against a fake Docker API, taking elapsed seconds."""
+        with mock.patch('users.docker_utils.docker.from_env', side_effect=Exception('no daemon')):
+            manager = DockerManager()
+        manager.client = mock.MagicMock()
+        api = manager.client.api
+        api.exec_create.return_value = {'Id': 'exec'}
+        api.exec_start.return_value = [(b'out\n', None), (None, b'err\n')]
+        api.exec_inspect.return_value = {'ExitCode': exit_code}
+
+        project = mock.Mock(container_id='container')
+        with mock.patch('users.docker_utils.time.monotonic', side_effect=[100.0, 100.0 + elapsed]):
+            return manager.exec_command(project, 'python main.py', timeout=30)
+
+    def test_returns_output_and_exit_code(self):
+        self.assertEqual(self.exec_command(1, elapsed=0.5), ('out\n', 'err\n', 1, False))
+
+    def test_stopped_at_timeout(self):
+        self.assertTrue(self.exec_command(124, elapsed=30.1)[3])
+
+    def test_killed_after_ignoring_sigterm(self):
+        self.assertTrue(self.exec_command(137, elapsed=35.1)[3])
+
+    def test_program_exiting_with_timeout_code_did_not_time_out(self):
+        self.assertFalse(self.exec_command(124, elapsed=0.5)[3])
+
+
+class NoNewUsersAccountAdapterTests(TestCase):
+    def setUp(self):
+        self.adapter = NoNewUsersAccountAdapter()
+        self.user = User.objects.create_user(username='tester', email='tester@example.com', password='secret')
+        self.request = RequestFactory().get('/')
+        self.request.session = {}
+
+    def test_social_flow_marker_allows_login(self):
+        self.request._is_social_login = True
+
+        self.assertTrue(self.adapter._is_social_login(self.request, self.user))
+
+    def test_leftover_social_session_does_not_allow_direct_login(self):
+        # Left behind by an abandoned signup or connect flow
+        self.request.session['socialaccount_sociallogin'] = {'account': {}}
+
+        self.assertFalse(self.adapter._is_social_login(self.request, self.user))
@@ -13,7 +13,7 @@ import logging
 import requests
 from .models import Project, UserProfile, ChatMessage
 from .forms import ProjectForm, UserProfileForm
-from .docker_utils import docker_manager
+from .docker_utils import get_docker_manager
 
 def test_view(request):
     """Simple test view to verify template rendering."""
@@ -21,6 +21,17 @@ def test_view(request):
 
 logger = logging.getLogger(__name__)
 
+def _is_within_directory(path, directory):
+    """
+    Check whether a path lies inside a directory.
+
+    Symlinks and '..' segments are resolved first, so neither can lead out
+    of the directory; the check itself is a single string prefix comparison.
+    """
+    directory = os.path.realpath(directory)
+    path = os.path.realpath(path)
+    return path == directory or path.startswith(directory + os.sep)
+
 @login_required
 def project_list(request):
     """View to display all projects for the logged-in user."""
@@ -84,11 +95,11 @@ def project_detail(request, pk):
     project = get_object_or_404(Project, pk=pk, user=request.user)
 
     # Check if Docker is available
-    docker_available = docker_manager.is_available()
+    docker_available = get_docker_manager().is_available()
 
     # If the project has a container, get its current status
     if project.container_id and docker_available:
-        current_status = docker_manager.get_container_status(project)
+        current_status = get_docker_manager().get_container_status(project)
     else:
         current_status = None
 
@@ -162,7 +173,7 @@ def container_create(request, pk):
 
     if request.method == 'POST':
         # Check if Docker is available
-        if not docker_manager.is_available():
+        if not get_docker_manager().is_available():
             messages.error(request, 'Docker is not available. Please make sure Docker is running.')
             return redirect('project_detail', pk=project.pk)
 
@@ -172,7 +183,7 @@ def container_create(request, pk):
             return redirect('project_detail', pk=project.pk)
 
         # Create the container
-        success = docker_manager.create_container(project)
+        success = get_docker_manager().create_container(project)
 
         if success:
             messages.success(request, 'Container created successfully!')
@@ -192,7 +203,7 @@ def container_start(request, pk):
 
     if request.method == 'POST':
         # Check if Docker is available
-        if not docker_manager.is_available():
+        if not get_docker_manager().is_available():
             messages.error(request, 'Docker is not available. Please make sure Docker is running.')
             return redirect('project_detail', pk=project.pk)
 
@@ -202,7 +213,7 @@ def container_start(request, pk):
             return redirect('project_detail', pk=project.pk)
 
         # Start the container
-        success = docker_manager.start_container(project)
+        success = get_docker_manager().start_container(project)
 
         if success:
             messages.success(request, 'Container started successfully!')
@@ -218,7 +229,7 @@ def container_stop(request, pk):
 
     if request.method == 'POST':
         # Check if Docker is available
-        if not docker_manager.is_available():
+        if not get_docker_manager().is_available():
             messages.error(request, 'Docker is not available. Please make sure Docker is running.')
             return redirect('project_detail', pk=project.pk)
 
@@ -228,7 +239,7 @@ def container_stop(request, pk):
             return redirect('project_detail', pk=project.pk)
 
         # Stop the container
-        success = docker_manager.stop_container(project)
+        success = get_docker_manager().stop_container(project)
 
         if success:
             messages.success(request, 'Container stopped successfully!')
@@ -244,7 +255,7 @@ def container_remove(request, pk):
 
     if request.method == 'POST':
         # Check if Docker is available
-        if not docker_manager.is_available():
+        if not get_docker_manager().is_available():
             messages.error(request, 'Docker is not available. Please make sure Docker is running.')
             return redirect('project_detail', pk=project.pk)
 
@@ -254,7 +265,7 @@ def container_remove(request, pk):
             return redirect('project_detail', pk=project.pk)
 
         # Remove the container
-        success = docker_manager.remove_container(project)
+        success = get_docker_manager().remove_container(project)
 
         if success:
             messages.success(request, 'Container removed successfully!')
@@ -269,7 +280,7 @@ def container_status(request, pk):
     project = get_object_or_404(Project, pk=pk, user=request.user)
 
     # Check if Docker is available
-    if not docker_manager.is_available():
+    if not get_docker_manager().is_available():
         return JsonResponse({'status': 'error', 'message': 'Docker is not available'})
 
     # Check if the project has a container
@@ -277,7 +288,7 @@ def container_status(request, pk):
         return JsonResponse({'status': 'error', 'message': 'No container for this project'})
 
     # Get the container status
-    status = docker_manager.get_container_status(project)
+    status = get_docker_manager().get_container_status(project)
 
     if status is None:
         return JsonResponse({'status': 'error', 'message': 'Failed to get container status'})
@@ -304,17 +315,20 @@ def code_editor(request, pk):
         full_path = os.path.join(root_path, relative_path)
 
         try:
-            for item in os.listdir(full_path):
-                item_relative_path = os.path.join(relative_path, item)
-                item_full_path = os.path.join(root_path, item_relative_path)
-
-                is_dir = os.path.isdir(item_full_path)
+            # scandir gets each entry's type along with its name, so no stat() call
+            # per entry is needed to tell directories from files
+            with os.scandir(full_path) as entries:
+                entries = list(entries)
+            for entry in entries:
+                item = entry.name
 
                 # Skip hidden files and directories
                 if item.startswith('.'):
                     continue
 
-                if is_dir:
+                item_relative_path = os.path.join(relative_path, item)
+
+                if entry.is_dir(follow_symlinks=False):
                     children = get_directory_structure(root_path, item_relative_path)
                     items.append({
                         'name': item,
@@ -324,7 +338,7 @@ def code_editor(request, pk):
                     })
                 else:
                     # Get file size
-                    size = os.path.getsize(item_full_path)
+                    size = entry.stat().st_size
                     # Format size
                     if size < 1024:
                         size_str = f"{size} B"
@@ -366,7 +380,7 @@ def code_editor(request, pk):
         try:
             full_file_path = os.path.join(data_dir, file_path)
             # Make sure the file is within the project directory (security check)
-            if os.path.commonpath([full_file_path, data_dir]) == data_dir:
+            if _is_within_directory(full_file_path, data_dir):
                 with open(full_file_path, 'r') as f:
                     file_content = f.read()
                 current_file = {
@@ -378,12 +392,12 @@ def code_editor(request, pk):
             file_content = None
 
     # Check if Docker is available and the container is running
-    docker_available = docker_manager.is_available()
+    docker_available = get_docker_manager().is_available()
     container_running = False
     web_server_port = None
 
     if docker_available and project.container_id:
-        container_status = docker_manager.get_container_status(project)
+        container_status = get_docker_manager().get_container_status(project)
         container_running = container_status == 'running'
 
         # Get the web server port if the container is running
@@ -420,7 +434,7 @@ def file_save(request, pk):
 
         # Security check: make sure the file is within the project directory
         full_file_path = os.path.join(data_dir, file_path)
-        if os.path.commonpath([full_file_path, data_dir]) != data_dir:
+        if not _is_within_directory(full_file_path, data_dir):
             return JsonResponse({'status': 'error', 'message': 'Invalid file path'}, status=403)
 
         # Create directory if it doesn't exist
@@ -457,7 +471,7 @@ def file_create(request, pk):
         full_path = os.path.join(data_dir, relative_path)
 
         # Security check: make sure the file is within the project directory
-        if os.path.commonpath([full_path, data_dir]) != data_dir:
+        if not _is_within_directory(full_path, data_dir):
             return JsonResponse({'status': 'error', 'message': 'Invalid path'}, status=403)
 
         # Check if the file/directory already exists
@@ -506,7 +520,7 @@ def file_delete(request, pk):
 
         # Security check: make sure the file is within the project directory
         full_path = os.path.join(data_dir, file_path)
-        if os.path.commonpath([full_path, data_dir]) != data_dir:
+        if not _is_within_directory(full_path, data_dir):
             return JsonResponse({'status': 'error', 'message': 'Invalid file path'}, status=403)
 
         # Check if the file/directory exists
@@ -545,7 +559,7 @@ def file_rename(request, pk):
 
         # Security check: make sure the file is within the project directory
         full_path = os.path.join(data_dir, file_path)
-        if os.path.commonpath([full_path, data_dir]) != data_dir:
+        if not _is_within_directory(full_path, data_dir):
             return JsonResponse({'status': 'error', 'message': 'Invalid file path'}, status=403)
 
         # Check if the file/directory exists
@@ -558,7 +572,7 @@ def file_rename(request, pk):
         new_full_path = os.path.join(data_dir, new_path)
 
         # Security check: make sure the new path is within the project directory
-        if os.path.commonpath([new_full_path, data_dir]) != data_dir:
+        if not _is_within_directory(new_full_path, data_dir):
             return JsonResponse({'status': 'error', 'message': 'Invalid new path'}, status=403)
 
         # Check if the new path already exists
@@ -789,15 +803,15 @@ def chat_with_openai(request, pk):
         current_file = data.get('current_file')
         current_file_content = data.get('current_file_content')
 
-        # Get the last 10 messages for this project (excluding the one we just created)
+        # Get the 9 messages before the one we just added, newest first, loading only
+        # the fields that are used; ids grow with insertion order, so no exclude is needed
         recent_messages = ChatMessage.objects.filter(
-            project=project
-        ).exclude(
-            id=user_chat_message.id
-        ).order_by('-timestamp')[:9]  # Get 9 to make room for the new message
+            project_id=project.pk,
+            id__lt=user_chat_message.id
+        ).order_by('-id').only('id', 'role', 'content', 'timestamp')[:9]
 
         # Reverse the order to have oldest first
-        recent_messages = list(reversed(recent_messages))
+        recent_messages = list(recent_messages)[::-1]
 
         # Call the internal function
         return chat_with_openai_internal(
@@ -835,17 +849,20 @@ def get_file_tree(request, pk):
             full_path = os.path.join(root_path, relative_path)
 
             try:
-                for item in os.listdir(full_path):
-                    item_relative_path = os.path.join(relative_path, item)
-                    item_full_path = os.path.join(root_path, item_relative_path)
-
-                    is_dir = os.path.isdir(item_full_path)
+                # scandir gets each entry's type along with its name, so no stat() call
+                # per entry is needed to tell directories from files
+                with os.scandir(full_path) as entries:
+                    entries = list(entries)
+                for entry in entries:
+                    item = entry.name
 
                     # Skip hidden files and directories
                     if item.startswith('.'):
                         continue
 
-                    if is_dir:
+                    item_relative_path = os.path.join(relative_path, item)
+
+                    if entry.is_dir(follow_symlinks=False):
                         children = get_directory_structure(root_path, item_relative_path)
                         items.append({
                             'name': item,
@@ -855,7 +872,7 @@ def get_file_tree(request, pk):
                         })
                     else:
                         # Get file size
-                        size = os.path.getsize(item_full_path)
+                        size = entry.stat().st_size
                         # Format size
                         if size < 1024:
                             size_str = f"{size} B"